@@ -1,43 +1,313 @@
-from flask import Flask, jsonify
+import atexit
+import itertools
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+
+from flask import Flask, Response, current_app, g, jsonify, request
+from flask.logging import default_handler
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
-from flask_jwt_extended import JWTManager
-from flask_cors import CORS
+from flask_compress import Compress
 from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import DisconnectionError
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool
 from config import config
+from app.utils import CachedJWTManager, OrjsonProvider, UploadRequest
 
 # Initialize extensions
-db = SQLAlchemy()
+# Objects stay loaded after commit: the session is removed at the end of each
+# request anyway, and reading a just-committed row shouldn't cost a SELECT.
+# Use db.session.refresh(obj) where state written by others is needed.
+db = SQLAlchemy(session_options={'expire_on_commit': False})
 migrate = Migrate()
-jwt = JWTManager()
+compress = Compress()
+jwt = CachedJWTManager()
 
-# Custom function to skip rate limiting for OPTIONS requests
+# Rate limit by client IP, read straight from the WSGI environ; OPTIONS is not limited
 def get_remote_address_skip_options():
-    from flask import request
-    if request.method == 'OPTIONS':
+    environ = request.environ
+    if environ['REQUEST_METHOD'] == 'OPTIONS':
         return None  # Skip rate limiting for OPTIONS
-    return get_remote_address()
+    return environ.get('REMOTE_ADDR') or '127.0.0.1'
 
+# Storage, strategy and default limits come from RATELIMIT_* in config so
+# every worker shares the same counters when Redis is configured
 limiter = Limiter(
     key_func=get_remote_address_skip_options,  # Rate limit by IP, but skip OPTIONS
-    default_limits=["200 per day", "50 per hour"],
-    storage_uri="memory://",  # Use in-memory storage (for development)
 )
 
+# CORS for /api/*: origins allowed by CORS_ORIGINS ('*' or a frozenset), with
+# credentials. The origin is echoed back because browsers reject '*' on
+# credentialed requests. Headers are built once here.
+_CORS_METHODS = ["GET", "POST", "PUT", "DELETE", "OPTIONS"]
+_CORS_HEADERS = ["Content-Type", "Authorization"]
+_PREFLIGHT_HEADERS = {
+    'Access-Control-Allow-Methods': ', '.join(_CORS_METHODS),
+    'Access-Control-Allow-Headers': ', '.join(_CORS_HEADERS),
+    'Access-Control-Allow-Credentials': 'true',
+    'Access-Control-Max-Age': '600',
+    'Vary': 'Origin',
+}
+_RESPONSE_CORS_HEADERS = (
+    ('Access-Control-Allow-Credentials', 'true'),
+    ('Vary', 'Origin'),
+)
+
+
+def _origin_allowed(origin):
+    allowed = current_app.config['CORS_ORIGINS']
+    return allowed == '*' or origin.lower() in allowed
+
+
+def _answer_preflight():
+    """Reply to CORS preflights before rate limiting and blueprint dispatch"""
+    if request.method != 'OPTIONS' or not request.path.startswith('/api/'):
+        return None
+    origin = request.environ.get('HTTP_ORIGIN')
+    if origin is not None and not _origin_allowed(origin):
+        # No Allow-* headers: the browser blocks the actual request
+        return Response(b'', 204, headers={'Vary': 'Origin'})
+    response = Response(b'', 204, headers=_PREFLIGHT_HEADERS)
+    response.headers['Access-Control-Allow-Origin'] = origin or '*'
+    return response
+
+
+def _add_cors_headers(response):
+    """Attach CORS headers to allowed cross-origin /api/ responses (preflights already have them)"""
+    origin = request.environ.get('HTTP_ORIGIN')
+    if (origin and request.path.startswith('/api/')
+            and 'Access-Control-Allow-Origin' not in response.headers
+            and _origin_allowed(origin)):
+        response.headers['Access-Control-Allow-Origin'] = origin
+        response.headers.extend(_RESPONSE_CORS_HEADERS)
+    return response
+
+
+# One commit per request: views add/flush and this hook commits the unit of work.
+# Routes and services must not call commit() themselves; exceptions skip the
+# hook and the session teardown rolls back.
+_READ_ONLY_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+
+def after_commit(callback):
+    """Run `callback()` once this request's transaction has committed
+    
+    Use it to drop caches of rows the view changed: clearing them before the
+    commit lets a concurrent read re-cache the old data. Dropped on rollback.
+    """
+    g.setdefault('after_commit', []).append(callback)
+
+
+def _commit_session(response):
+    """Commit a successful write request's transaction, roll back on error responses"""
+    if request.environ['REQUEST_METHOD'] in _READ_ONLY_METHODS:
+        return response
+    if response.status_code < 400:
+        db.session.commit()
+        for callback in g.pop('after_commit', ()):
+            callback()
+    else:
+        db.session.rollback()
+    return response
+
+
+# Request logging is handed to a queue; a background listener does the I/O
+access_logger = logging.getLogger('app.access')
+jwt_logger = logging.getLogger('app.jwt')
+_log_queue = queue.Queue(-1)
+_queue_handler = logging.handlers.QueueHandler(_log_queue)
+_log_listener = None
+
+
+class _SampledSQLFilter(logging.Filter):
+    """Keep 1 in `every` SQL statements, along with the parameter line that follows it"""
+    
+    def __init__(self, every):
+        super().__init__()
+        self.every = every
+        self._count = itertools.count()
+        self._local = threading.local()
+    
+    def filter(self, record):
+        # SQLAlchemy logs parameters as a second record starting with "[cached ...]"
+        if isinstance(record.msg, str) and record.msg.startswith('['):
+            return getattr(self._local, 'keep', False)
+        self._local.keep = next(self._count) % self.every == 0
+        return self._local.keep
+
+
+def _configure_sql_logging(app):
+    """In debug, sample SQL statements through the log queue instead of SQLALCHEMY_ECHO"""
+    every = app.config.get('SQL_LOG_SAMPLE')
+    if not app.debug or not every:
+        return
+    sql_logger = logging.getLogger('sqlalchemy.engine')
+    sql_logger.setLevel(logging.INFO)
+    if not any(isinstance(f, _SampledSQLFilter) for h in sql_logger.handlers for f in h.filters):
+        # Filter on the handler: records come from the child 'sqlalchemy.engine.Engine' logger
+        handler = logging.handlers.QueueHandler(_log_queue)
+        handler.addFilter(_SampledSQLFilter(every))
+        sql_logger.addHandler(handler)
+        sql_logger.propagate = False
+
+
+def _configure_logging(app):
+    """Route app loggers through the queue and start the listener once"""
+    global _log_listener
+    for logger in (access_logger, jwt_logger):
+        logger.setLevel(app.config['LOG_LEVEL'])
+    
+    if _log_listener is None:
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(logging.Formatter('%(levelname)s: %(message)s'))
+        _log_listener = logging.handlers.QueueListener(
+            _log_queue, stream_handler, respect_handler_level=True
+        )
+        _log_listener.start()
+        atexit.register(_log_listener.stop)
+    
+    # app.logger ('app') is the parent of app.access/app.jwt; swap Flask's
+    # synchronous stderr handler for the queue so handlers never block a request
+    app.logger.removeHandler(default_handler)
+    if _queue_handler not in app.logger.handlers:
+        app.logger.addHandler(_queue_handler)
+    app.logger.propagate = False
+    _configure_sql_logging(app)
+
+
+def _use_pooler_url(app):
+    """Point the runtime engine at DATABASE_POOLER_URL, keeping the direct URL for DDL
+
+    Transaction-mode poolers hand each transaction to any server connection, so
+    per-connection state is off limits: no startup `options` (PgBouncer rejects
+    them; set the timezone on the role instead) and no server-side prepared
+    statements on psycopg 3.
+    """
+    app.config['DATABASE_DIRECT_URL'] = app.config['SQLALCHEMY_DATABASE_URI']
+    pooler_url = app.config.get('DATABASE_POOLER_URL')
+    if not pooler_url:
+        return
+    
+    direct_connect_args = app.config['SQLALCHEMY_ENGINE_OPTIONS'].get('connect_args', {})
+    app.config['DATABASE_DIRECT_CONNECT_ARGS'] = direct_connect_args
+    connect_args = {k: v for k, v in direct_connect_args.items() if k != 'options'}
+    if make_url(pooler_url).get_driver_name() == 'psycopg':
+        connect_args['prepare_threshold'] = None
+    app.config['SQLALCHEMY_DATABASE_URI'] = pooler_url
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **app.config['SQLALCHEMY_ENGINE_OPTIONS'],
+        'connect_args': connect_args
+    }
+
+
+def get_direct_engine():
+    """Engine on the direct database URL for migrations and schema changes
+
+    This is `db.engine` unless a pooler URL is configured, in which case it is
+    an unpooled engine on DATABASE_DIRECT_URL, created once per app.
+    """
+    app = current_app._get_current_object()
+    if not app.config.get('DATABASE_POOLER_URL'):
+        return db.engine
+    engine = app.extensions.get('direct_engine')
+    if engine is None:
+        engine = create_engine(
+            app.config['DATABASE_DIRECT_URL'],
+            poolclass=NullPool,
+            connect_args=app.config['DATABASE_DIRECT_CONNECT_ARGS']
+        )
+        app.extensions['direct_engine'] = engine
+    return engine
+
+
+def _ping_idle_connections(engine, idle_after):
+    """Validate a pooled connection on checkout only if it sat idle for `idle_after` seconds
+
+    A failed ping raises DisconnectionError, which makes the pool discard the
+    connection and check out a fresh one.
+    """
+    @event.listens_for(engine, 'checkin')
+    def mark_idle(dbapi_connection, connection_record):
+        connection_record.info['last_used'] = time.monotonic()
+    
+    @event.listens_for(engine, 'checkout')
+    def ping_if_idle(dbapi_connection, connection_record, connection_proxy):
+        last_used = connection_record.info.get('last_used')
+        if last_used is None or time.monotonic() - last_used < idle_after:
+            return
+        try:
+            cursor = dbapi_connection.cursor()
+            cursor.execute('SELECT 1')
+            cursor.close()
+        except Exception as e:
+            raise DisconnectionError() from e
+
+
+def warm_pool(app):
+    """Open `pool_size` connections up front so the first requests skip the handshake
+
+    Best effort: an unreachable database is logged and left to the first request.
+    """
+    size = app.config['SQLALCHEMY_ENGINE_OPTIONS'].get('pool_size')
+    if not size:
+        return
+    with app.app_context():
+        connections = []
+        try:
+            for _ in range(size):
+                connections.append(db.engine.raw_connection())
+        except Exception as e:
+            app.logger.warning("Connection pool warm-up stopped after %d: %s", len(connections), e)
+        finally:
+            for connection in connections:
+                connection.close()
+
+
+def _initialize_in_background(app):
+    """Run slow startup work off the boot path; LLM routes wait on `ready`"""
+    from app.services.llm_service import llm_service
+    
+    def run():
+        with app.app_context():
+            try:
+                llm_service.initialize()
+            finally:
+                llm_service.ready.set()
+    
+    threading.Thread(target=run, name='app-init', daemon=True).start()
+
 
 def create_app(config_name='development'):
     """Application factory pattern"""
     app = Flask(__name__)
     
-    # Load configuration
-    app.config.from_object(config[config_name])
+    # Load configuration (instantiated so ProductionConfig can validate the environment)
+    app.config.from_object(config[config_name]())
+    app.json = OrjsonProvider(app)
+    app.request_class = UploadRequest
+    # Uploads spool here, so it must exist before the first request
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    _use_pooler_url(app)
     
     # Initialize extensions
     db.init_app(app)
+    idle_ping_after = app.config.get('DB_POOL_IDLE_PING_AFTER')
+    if idle_ping_after and not app.config['SQLALCHEMY_ENGINE_OPTIONS'].get('pool_pre_ping'):
+        with app.app_context():
+            _ping_idle_connections(db.engine, idle_ping_after)
     migrate.init_app(app, db)
     jwt.init_app(app)
+    compress.init_app(app)
+    # Registered ahead of the limiter so preflights skip its before_request hook
+    app.before_request(_answer_preflight)
     limiter.init_app(app)
+    _configure_logging(app)
     
     # Rate limit error handler
     @app.errorhandler(429)
@@ -51,33 +321,39 @@ def create_app(config_name='development'):
     # JWT error handlers
     @jwt.expired_token_loader
     def expired_token_callback(jwt_header, jwt_payload):
-        print(f"DEBUG: Token expired! {jwt_payload}")
+        jwt_logger.debug("Token expired: %s", jwt_payload)
         return jsonify({'error': 'Token has expired'}), 401
     
     @jwt.invalid_token_loader
     def invalid_token_callback(error):
-        print(f"DEBUG: Invalid token! Error: {error}")
+        jwt_logger.debug("Invalid token: %s", error)
         return jsonify({'error': 'Invalid token', 'message': str(error)}), 422
     
     @jwt.unauthorized_loader
     def unauthorized_callback(error):
-        print(f"DEBUG: No authorization header! Error: {error}")
+        jwt_logger.debug("No authorization header: %s", error)
         return jsonify({'error': 'Missing authorization header'}), 401
     
     # Configure CORS to allow frontend requests
-    CORS(app, 
-         resources={r"/api/*": {"origins": "*"}},
-         supports_credentials=True,
-         allow_headers=["Content-Type", "Authorization"],
-         methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
+    app.after_request(_add_cors_headers)
+    
+    # Registered last so it runs first, before CORS and compression
+    app.after_request(_commit_session)
     
     # Add request logging
     @app.before_request
     def log_request():
-        from flask import request
-        print(f"DEBUG: {request.method} {request.path}")
-        print(f"DEBUG: Headers: Authorization={request.headers.get('Authorization', 'MISSING')}")
-        print(f"DEBUG: Content-Type={request.headers.get('Content-Type')}")
+        if request.method == 'OPTIONS' or not access_logger.isEnabledFor(logging.DEBUG):
+            return
+        # Plain dict lookups on the WSGI environ instead of EnvironHeaders scans
+        environ = request.environ
+        access_logger.debug(
+            "%s %s auth=%s ct=%s",
+            request.method,
+            request.path,
+            environ.get('HTTP_AUTHORIZATION', 'MISSING'),
+            environ.get('CONTENT_TYPE'),
+        )
     
     # Register blueprints
     from app.routes import auth, workouts, llm, pose, habits
@@ -87,18 +363,39 @@ def create_app(config_name='development'):
     app.register_blueprint(pose.bp, url_prefix='/api/pose')
     app.register_blueprint(habits.bp, url_prefix='/api/habits')
     
-    # Initialize LLM service
-    with app.app_context():
-        from app.services.llm_service import llm_service
-        llm_service.initialize()
+    # Initialize LLM service without blocking worker boot
+    _initialize_in_background(app)
     
     # Health check endpoint
     @app.route('/health')
     def health():
         return {'status': 'healthy', 'message': 'Fitness Companion API is running'}, 200
     
-    # Create upload folder
-    import os
-    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    # Database round trip and this worker's pool usage, for sizing DB_POOL_SIZE/DB_MAX_OVERFLOW
+    @app.route('/health/db')
+    def health_db():
+        start = time.perf_counter()
+        try:
+            db.session.execute(text('SELECT 1'))
+        except Exception as e:
+            app.logger.warning("Database health check failed: %s", e)
+            return {'status': 'unhealthy', 'error': 'Database unreachable'}, 503
+        latency_ms = (time.perf_counter() - start) * 1000
+        
+        pool = db.engine.pool
+        stats = {'status': 'healthy', 'latency_ms': round(latency_ms, 2)}
+        if hasattr(pool, 'size'):  # QueuePool; NullPool keeps no connections
+            size = pool.size()
+            stats.update(
+                pool_size=size,
+                idle=pool.checkedin(),
+                checked_out=pool.checkedout(),
+                overflow=max(pool.overflow(), 0),  # negative until the pool first fills
+                max_overflow=app.config['SQLALCHEMY_ENGINE_OPTIONS'].get('max_overflow')
+            )
+            stats['warn'] = latency_ms > 100 or (size > 0 and pool.checkedout() / size > 0.8)
+        else:
+            stats['warn'] = latency_ms > 100
+        return stats, 200
     
     return app
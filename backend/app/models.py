@@ -1,7 +1,48 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from sqlalchemy import event, func, orm, select
 from app import db
-from werkzeug.security import generate_password_hash, check_password_hash
-import json
+from werkzeug.security import check_password_hash
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+import orjson
+import os
+
+
+# argon2id at OWASP's minimum profile: far cheaper to verify than Werkzeug's pbkdf2 default
+password_hasher = PasswordHasher(time_cost=2, memory_cost=19456, parallelism=1)
+
+# argon2 and hashlib's pbkdf2 release the GIL, so KDF work runs on a bounded pool:
+# other request threads keep running, and a burst of logins cannot run more
+# hashes at once than there are cores (argon2 also needs ~19 MiB per hash)
+_KDF_POOL = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix='kdf')
+
+
+def hash_password(password):
+    """Hash a password with argon2id on the KDF pool"""
+    return _KDF_POOL.submit(password_hasher.hash, password).result()
+
+
+def verify_password(password_hash, password):
+    """Check a password against a stored argon2 or legacy Werkzeug hash"""
+    return _KDF_POOL.submit(_verify_password, password_hash, password).result()
+
+
+def _verify_password(password_hash, password):
+    if not password_hash.startswith('$argon2'):
+        return check_password_hash(password_hash, password)
+    
+    try:
+        return password_hasher.verify(password_hash, password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+
+def password_hash_needs_rehash(password_hash):
+    """True for legacy hashes or argon2 hashes with outdated parameters"""
+    if not password_hash.startswith('$argon2'):
+        return True
+    return password_hasher.check_needs_rehash(password_hash)
 
 
 class User(db.Model):
@@ -10,7 +51,7 @@ class User(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False, index=True)
-    username = db.Column(db.String(80), unique=True, nullable=False)
+    username = db.Column(db.String(80), unique=True, nullable=False, index=True)
     password_hash = db.Column(db.String(255), nullable=False)
     name = db.Column(db.String(120))
     
@@ -20,36 +61,115 @@ class User(db.Model):
     fitness_level = db.Column(db.String(20))  # beginner, intermediate, advanced
     goals = db.Column(db.Text)  # JSON string of fitness goals
     
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Facts distilled from older LLM messages; messages up to and including
+    # memory_summary_upto (an llm_conversations id) are covered by the summary
+    memory_summary = db.Column(db.Text)
+    memory_summary_upto = db.Column(db.Integer)
+    
+    # Stamped by the database (UTC, see connect_args in config)
+    created_at = db.Column(db.DateTime, server_default=func.now())
+    updated_at = db.Column(db.DateTime, server_default=func.now(), onupdate=func.now())
     
     # Relationships
-    workout_routines = db.relationship('WorkoutRoutine', backref='user', lazy='dynamic', cascade='all, delete-orphan')
-    workout_sessions = db.relationship('WorkoutSession', backref='user', lazy='dynamic', cascade='all, delete-orphan')
-    habits = db.relationship('Habit', backref='user', lazy='dynamic', cascade='all, delete-orphan')
-    llm_conversations = db.relationship('LLMConversation', backref='user', lazy='dynamic', cascade='all, delete-orphan')
+    workout_routines = db.relationship('WorkoutRoutine', back_populates='user', lazy='dynamic', cascade='all, delete-orphan')
+    workout_sessions = db.relationship('WorkoutSession', back_populates='user', lazy='dynamic', cascade='all, delete-orphan')
+    habits = db.relationship('Habit', back_populates='user', lazy='dynamic', cascade='all, delete-orphan')
+    llm_conversations = db.relationship('LLMConversation', back_populates='user', lazy='dynamic', cascade='all, delete-orphan')
     
     def set_password(self, password):
         """Hash and set password"""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
-        """Verify password"""
-        return check_password_hash(self.password_hash, password)
+        """Verify password (legacy Werkzeug hashes are still accepted)"""
+        return verify_password(self.password_hash, password)
     
-    def to_dict(self):
-        """Convert to dictionary"""
-        return {
-            'id': self.id,
-            'email': self.email,
-            'username': self.username,
-            'name': self.name,
-            'height_cm': self.height_cm,
-            'weight_kg': self.weight_kg,
-            'fitness_level': self.fitness_level,
-            'goals': json.loads(self.goals) if self.goals else [],
-            'created_at': self.created_at.isoformat()
+    def password_needs_rehash(self):
+        """True for legacy hashes or argon2 hashes with outdated parameters"""
+        return password_hash_needs_rehash(self.password_hash)
+    
+    @orm.reconstructor
+    def _reset_caches(self):
+        """Clear memoized goals/to_dict output (also run on load)"""
+        self._goals_cache = None
+        self._dict_cache = None
+    
+    @property
+    def goals_list(self):
+        """Parsed goals, cached until the goals column changes"""
+        goals = getattr(self, '_goals_cache', None)
+        if goals is None:
+            goals = orjson.loads(self.goals) if self.goals else []
+            self._goals_cache = goals
+        return goals
+    
+    @goals_list.setter
+    def goals_list(self, value):
+        self.goals = orjson.dumps(value).decode()
+        self._goals_cache = value
+    
+    @classmethod
+    def dashboard_snapshot(cls, user_id):
+        """Load a user plus related-row counts in one round trip
+
+        Returns (user, counts) or None if the user does not exist.
+        """
+        counted = {
+            'workout_routines': WorkoutRoutine,
+            'workout_sessions': WorkoutSession,
+            'habits': Habit,
+            'llm_conversations': LLMConversation,
         }
+        stmt = select(cls, *(
+            select(func.count()).where(model.user_id == cls.id).scalar_subquery().label(name)
+            for name, model in counted.items()
+        )).where(cls.id == user_id)
+        
+        row = db.session.execute(stmt).first()
+        if row is None:
+            return None
+        return row[0], {name: row._mapping[name] for name in counted}
+    
+    def to_dict(self, counts=None):
+        """Convert to dictionary (cached until a serialized column changes)"""
+        data = getattr(self, '_dict_cache', None)
+        if data is None:
+            data = {
+                'id': self.id,
+                'email': self.email,
+                'username': self.username,
+                'name': self.name,
+                'height_cm': self.height_cm,
+                'weight_kg': self.weight_kg,
+                'fitness_level': self.fitness_level,
+                'goals': self.goals_list,
+                'created_at': self.created_at
+            }
+            self._dict_cache = data
+        # Callers always get a fresh dict (and goals list), so changing the
+        # result can't corrupt the memo
+        data = {**data, 'goals': list(data['goals'])}
+        if counts is not None:
+            data['counts'] = counts
+        return data
+
+
+def _invalidate_user_caches(target, *args):
+    target._reset_caches()
+
+
+def _invalidate_user_caches_after_flush(mapper, connection, target):
+    target._reset_caches()
+
+
+# Drop the memoized to_dict/goals whenever a serialized column is set or reloaded
+for _column in ('id', 'email', 'username', 'name', 'height_cm', 'weight_kg',
+                'fitness_level', 'goals', 'created_at'):
+    event.listen(getattr(User, _column), 'set', _invalidate_user_caches)
+event.listen(User, 'expire', _invalidate_user_caches)
+event.listen(User, 'refresh', _invalidate_user_caches)
+event.listen(User, 'after_insert', _invalidate_user_caches_after_flush)
+event.listen(User, 'after_update', _invalidate_user_caches_after_flush)
 
 
 class WorkoutRoutine(db.Model):
@@ -69,8 +189,9 @@ class WorkoutRoutine(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
-    sessions = db.relationship('WorkoutSession', backref='routine', lazy='dynamic')
-    habits = db.relationship('Habit', backref='routine', lazy='dynamic')
+    user = db.relationship('User', back_populates='workout_routines')
+    sessions = db.relationship('WorkoutSession', back_populates='routine', lazy='dynamic')
+    habits = db.relationship('Habit', back_populates='routine', lazy='dynamic')
     
     def to_dict(self):
         return {
@@ -81,13 +202,19 @@ class WorkoutRoutine(db.Model):
             'difficulty': self.difficulty,
             'estimated_duration_minutes': self.estimated_duration_minutes,
             'is_camera_based': self.is_camera_based,
-            'created_at': self.created_at.isoformat()
+            'created_at': self.created_at
         }
 
 
 class WorkoutSession(db.Model):
     """Actual workout sessions (completed or in-progress)"""
     __tablename__ = 'workout_sessions'
+    __table_args__ = (
+        # Per-user stats filter on completed_at
+        db.Index('ix_workout_sessions_user_id_completed_at', 'user_id', 'completed_at'),
+        # Session listing pages newest-first per user
+        db.Index('ix_workout_sessions_user_id_started_at', 'user_id', 'started_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
@@ -106,15 +233,17 @@ class WorkoutSession(db.Model):
     notes = db.Column(db.Text)
     
     # Relationships
-    pose_analyses = db.relationship('PoseAnalysis', backref='session', lazy='dynamic', cascade='all, delete-orphan')
+    user = db.relationship('User', back_populates='workout_sessions')
+    routine = db.relationship('WorkoutRoutine', back_populates='sessions')
+    pose_analyses = db.relationship('PoseAnalysis', back_populates='session', lazy='dynamic', cascade='all, delete-orphan')
     
     def to_dict(self):
         return {
             'id': self.id,
             'routine': self.routine.to_dict() if self.routine else None,
             'session_type': self.session_type,
-            'started_at': self.started_at.isoformat(),
-            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'started_at': self.started_at,
+            'completed_at': self.completed_at,
             'duration_minutes': self.duration_minutes,
             'exercises_completed': self.exercises_completed,
             'calories_burned': self.calories_burned,
@@ -132,7 +261,8 @@ class PoseAnalysis(db.Model):
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Pose data
-    keypoints = db.Column(db.JSON)  # MediaPipe pose keypoints (33 landmarks)
+    # MediaPipe pose keypoints (33 landmarks); deferred since to_dict() never sends them
+    keypoints = orm.deferred(db.Column(db.JSON))
     form_score = db.Column(db.Float)  # 0-100 score for form quality
     feedback_text = db.Column(db.Text)  # Auto-generated feedback
     
@@ -140,11 +270,14 @@ class PoseAnalysis(db.Model):
     rep_count = db.Column(db.Integer, default=0)
     range_of_motion = db.Column(db.Float)
     
+    # Relationships
+    session = db.relationship('WorkoutSession', back_populates='pose_analyses')
+    
     def to_dict(self):
         return {
             'id': self.id,
             'exercise_name': self.exercise_name,
-            'timestamp': self.timestamp.isoformat(),
+            'timestamp': self.timestamp,
             'form_score': self.form_score,
             'feedback_text': self.feedback_text,
             'rep_count': self.rep_count,
@@ -155,6 +288,10 @@ class PoseAnalysis(db.Model):
 class Habit(db.Model):
     """Habit tracker for workout routines"""
     __tablename__ = 'habits'
+    __table_args__ = (
+        # Upcoming reminders: equality on user/active, range scan + order on next_reminder_at
+        db.Index('ix_habit_user_active_reminder', 'user_id', 'is_active', 'next_reminder_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
@@ -174,6 +311,10 @@ class Habit(db.Model):
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Relationships
+    user = db.relationship('User', back_populates='habits')
+    routine = db.relationship('WorkoutRoutine', back_populates='habits')
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -184,8 +325,8 @@ class Habit(db.Model):
             'current_streak': self.current_streak,
             'longest_streak': self.longest_streak,
             'total_completions': self.total_completions,
-            'last_completed_at': self.last_completed_at.isoformat() if self.last_completed_at else None,
-            'next_reminder_at': self.next_reminder_at.isoformat() if self.next_reminder_at else None,
+            'last_completed_at': self.last_completed_at,
+            'next_reminder_at': self.next_reminder_at,
             'is_active': self.is_active
         }
 
@@ -193,6 +334,12 @@ class Habit(db.Model):
 class LLMConversation(db.Model):
     """LLM conversation history for context-aware responses"""
     __tablename__ = 'llm_conversations'
+    __table_args__ = (
+        # Session listing groups a user's messages by session_id
+        db.Index('ix_llm_conversations_user_id_session_id_timestamp', 'user_id', 'session_id', 'timestamp'),
+        # LLM context reads a user's latest messages across all sessions
+        db.Index('ix_llm_conversations_user_id_timestamp', 'user_id', 'timestamp'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
@@ -206,10 +353,13 @@ class LLMConversation(db.Model):
     tokens_used = db.Column(db.Integer)
     model = db.Column(db.String(50))
     
+    # Relationships
+    user = db.relationship('User', back_populates='llm_conversations')
+    
     def to_dict(self):
         return {
             'id': self.id,
             'role': self.role,
             'content': self.content,
-            'timestamp': self.timestamp.isoformat()
+            'timestamp': self.timestamp
         }
@@ -1,19 +1,85 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, jsonify
 from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
-from app import db, limiter
-from app.models import User
-from app.utils import validate_user_registration, validate_user_profile_update, ValidationError
-from datetime import datetime
-import json
+from app import db, limiter, after_commit
+from app.models import User, hash_password, verify_password
+from app.utils import (validate_user_registration, validate_user_profile_update, ValidationError, get_json_body,
+                       get_current_user_id, get_redis, cache_get, cache_set, cache_delete)
+from threading import Lock
+from cachetools import TTLCache
+from sqlalchemy import case, exists, select
+from sqlalchemy.dialects.postgresql import insert
+import hashlib
+import orjson
 
 bp = Blueprint('auth', __name__)
 
+# Recently failed (email, password) pairs, rejected without running the KDF again.
+# Kept in Redis so every worker sees them; this process-local cache is only used
+# when REDIS_URL is unset.
+FAILED_LOGIN_TTL = 60  # seconds
+_failed_logins = TTLCache(maxsize=4096, ttl=FAILED_LOGIN_TTL)
+_failed_logins_lock = Lock()
+
+# Profile fields settable through PUT /me, with an optional column serializer
+_UPDATABLE = (
+    ('name', None),
+    ('height_cm', None),
+    ('weight_kg', None),
+    ('fitness_level', None),
+    ('goals', lambda goals: orjson.dumps(goals).decode()),
+)
+
+# Short-lived to_dict() snapshots for GET /me, dropped whenever the user is updated
+_USER_CACHE = TTLCache(maxsize=10000, ttl=5)
+_USER_CACHE_LOCK = Lock()
+
+
+def _forget_user_snapshot(user_id):
+    """Drop the GET /me snapshot once the update is committed"""
+    with _USER_CACHE_LOCK:
+        _USER_CACHE.pop(user_id, None)
+
+
+def _login_attempt_key(email, password):
+    """Short digest of an (email, password) pair for the failed-login cache"""
+    return hashlib.blake2b(f"{email}\0{password}".encode(), digest_size=16).hexdigest()
+
+
+def _failed_login_cache_key(attempt_key):
+    return f"login_failed:{attempt_key}"
+
+
+def _login_failed_recently(attempt_key):
+    """Whether this (email, password) pair failed within FAILED_LOGIN_TTL, in any worker"""
+    if get_redis() is None:
+        with _failed_logins_lock:
+            return attempt_key in _failed_logins
+    return cache_get(_failed_login_cache_key(attempt_key)) is not None
+
+
+def _remember_failed_login(attempt_key):
+    """Reject this pair without the KDF for the next FAILED_LOGIN_TTL seconds"""
+    if get_redis() is None:
+        with _failed_logins_lock:
+            _failed_logins[attempt_key] = True
+    else:
+        cache_set(_failed_login_cache_key(attempt_key), 1, FAILED_LOGIN_TTL)
+
+
+def _forget_failed_login(attempt_key):
+    """Accept this pair again, e.g. once it has become the account's password"""
+    if get_redis() is None:
+        with _failed_logins_lock:
+            _failed_logins.pop(attempt_key, None)
+    else:
+        cache_delete(_failed_login_cache_key(attempt_key))
+
 
 @bp.route('/register', methods=['POST'])
 @limiter.limit("5 per hour")  # Max 5 registrations per hour per IP
 def register():
     """Register a new user"""
-    data = request.get_json()
+    data = get_json_body()
     
     if not data:
         return jsonify({'error': 'No data provided'}), 400
@@ -23,24 +89,28 @@ def register():
     if errors:
         return jsonify({'error': 'Validation failed', 'details': errors}), 400
     
-    # Check if user exists
-    if User.query.filter_by(email=validated['email']).first():
-        return jsonify({'error': 'Email already registered'}), 409
-    
-    if User.query.filter_by(username=validated['username']).first():
-        return jsonify({'error': 'Username already taken'}), 409
-    
-    # Create user
-    user = User(
+    # Create user; unique email/username conflicts are detected by the insert itself
+    stmt = insert(User).values(
         email=validated['email'],
         username=validated['username'],
+        password_hash=hash_password(validated['password']),
         name=validated.get('name', ''),
         fitness_level=validated.get('fitness_level', 'beginner')
-    )
-    user.set_password(validated['password'])
+    ).on_conflict_do_nothing().returning(User)
+    user = db.session.scalars(stmt).first()
+    
+    if user is None:
+        # Only the conflict path pays for a second query to name the clashing field
+        conflict = db.session.scalar(select(case(
+            (exists().where(User.email == validated['email']), 'email'),
+            else_='username'
+        )))
+        if conflict == 'email':
+            return jsonify({'error': 'Email already registered'}), 409
+        return jsonify({'error': 'Username already taken'}), 409
     
-    db.session.add(user)
-    db.session.commit()
+    # The password may have been tried (and cached as wrong) before the account existed
+    _forget_failed_login(_login_attempt_key(validated['email'], validated['password']))
     
     # Generate tokens (user.id must be string)
     access_token = create_access_token(identity=str(user.id))
@@ -58,17 +128,35 @@ def register():
 @limiter.limit("10 per minute")  # Max 10 login attempts per minute per IP
 def login():
     """Login user"""
-    data = request.get_json()
+    data = get_json_body()
     
     if not data or not data.get('email') or not data.get('password'):
         return jsonify({'error': 'Missing email or password'}), 400
+    # Non-string values would otherwise fail inside the password hasher
+    if not isinstance(data['email'], str) or not isinstance(data['password'], str):
+        return jsonify({'error': 'Invalid email or password'}), 401
+    
+    # Same normalization as registration, so lookups and cache keys match
+    email = data['email'].strip().lower()
+    attempt_key = _login_attempt_key(email, data['password'])
+    if _login_failed_recently(attempt_key):
+        return jsonify({'error': 'Invalid email or password'}), 401
     
-    # Find user
-    user = User.query.filter_by(email=data['email']).first()
+    # Only the columns needed to verify; the full row is loaded after success
+    credentials = db.session.execute(
+        select(User.id, User.password_hash).where(User.email == email)
+    ).first()
     
-    if not user or not user.check_password(data['password']):
+    if not credentials or not verify_password(credentials.password_hash, data['password']):
+        _remember_failed_login(attempt_key)
         return jsonify({'error': 'Invalid email or password'}), 401
     
+    user = db.session.get(User, credentials.id)
+    
+    # Upgrade legacy/outdated hashes now that we have the plaintext
+    if user.password_needs_rehash():
+        user.set_password(data['password'])
+    
     # Generate tokens (user.id must be string)
     access_token = create_access_token(identity=str(user.id))
     refresh_token = create_refresh_token(identity=str(user.id))
@@ -96,26 +184,37 @@ def refresh():
 @jwt_required()
 def get_current_user():
     """Get current user profile"""
-    current_user_id = int(get_jwt_identity())  # Convert string back to int
-    user = User.query.get(current_user_id)
+    current_user_id = get_current_user_id()
+    with _USER_CACHE_LOCK:
+        snapshot = _USER_CACHE.get(current_user_id)
+    if snapshot is not None:
+        return jsonify({'user': snapshot}), 200
     
-    if not user:
+    # Profile plus related-row counts in a single query
+    result = User.dashboard_snapshot(current_user_id)
+    
+    if not result:
         return jsonify({'error': 'User not found'}), 404
     
-    return jsonify({'user': user.to_dict()}), 200
+    user, counts = result
+    snapshot = user.to_dict(counts=counts)
+    with _USER_CACHE_LOCK:
+        _USER_CACHE[current_user_id] = snapshot
+    
+    return jsonify({'user': snapshot}), 200
 
 
 @bp.route('/me', methods=['PUT'])
 @jwt_required()
 def update_profile():
     """Update user profile"""
-    current_user_id = int(get_jwt_identity())  # Convert string back to int
-    user = User.query.get(current_user_id)
+    current_user_id = get_current_user_id()
+    user = db.session.get(User, current_user_id)
     
     if not user:
         return jsonify({'error': 'User not found'}), 404
     
-    data = request.get_json()
+    data = get_json_body()
     
     if not data:
         return jsonify({'error': 'No data provided'}), 400
@@ -126,19 +225,14 @@ def update_profile():
         return jsonify({'error': 'Validation failed', 'details': errors}), 400
     
     # Update allowed fields
-    if 'name' in validated:
-        user.name = validated['name']
-    if 'height_cm' in validated:
-        user.height_cm = validated['height_cm']
-    if 'weight_kg' in validated:
-        user.weight_kg = validated['weight_kg']
-    if 'fitness_level' in validated:
-        user.fitness_level = validated['fitness_level']
-    if 'goals' in validated:
-        user.goals = json.dumps(validated['goals'])
-    
-    user.updated_at = datetime.utcnow()
-    db.session.commit()
+    for field, serialize in _UPDATABLE:
+        if field in validated:
+            value = validated[field]
+            setattr(user, field, serialize(value) if serialize else value)
+    
+    db.session.flush()
+    
+    after_commit(lambda: _forget_user_snapshot(current_user_id))
     
     return jsonify({
         'message': 'Profile updated successfully',
@@ -150,10 +244,12 @@ def update_profile():
 @limiter.limit("3 per hour")  # Max 3 password reset attempts per hour
 def reset_password():
     """Reset password (simplified - no email verification for development)"""
-    data = request.get_json()
+    data = get_json_body()
     
     if not data or not data.get('email'):
         return jsonify({'error': 'Email is required'}), 400
+    if not isinstance(data['email'], str):
+        return jsonify({'error': 'Email must be a string'}), 400
     
     # Find user by email
     user = User.query.filter_by(email=data['email'].lower().strip()).first()
@@ -181,8 +277,11 @@ def reset_password():
         
         # Reset password
         user.set_password(data.get('new_password'))
-        user.updated_at = datetime.utcnow()
-        db.session.commit()
+        
+        # The new password may have been tried (and cached as wrong) before the reset
+        _forget_failed_login(_login_attempt_key(user.email, data.get('new_password')))
+        user_id = user.id
+        after_commit(lambda: _forget_user_snapshot(user_id))
         
         return jsonify({
             'message': 'Password reset successfully! You can now login with your new password.'
@@ -1,22 +1,42 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from app import db
+from flask_jwt_extended import jwt_required
+from app import db, after_commit
 from app.models import Habit, WorkoutSession
-from app.utils import validate_habit, ValidationError
+from app.services.llm_service import llm_service
+from app.utils import validate_habit, ValidationError, get_json_body, get_current_user_id
 from datetime import datetime, timedelta
+from functools import lru_cache
+import time
+from sqlalchemy import Date, Integer, Time, and_, case, cast, func, literal, select, update
+from sqlalchemy.orm import raiseload, selectinload
 
 bp = Blueprint('habits', __name__)
 
+# Streak lengths that get celebrated in the completion response
+_MILESTONES = frozenset({7, 14, 30, 60, 90, 100, 365})
+
+# Streak grace period, read from config once when the blueprint is registered
+_grace_period = timedelta(hours=48)
+
+
+@bp.record
+def _load_config(state):
+    global _grace_period
+    hours = state.app.config.get('DEFAULT_STREAK_GRACE_PERIOD_HOURS', 48)
+    _grace_period = timedelta(hours=hours)
+
 
 @bp.route('/', methods=['GET'])
 @jwt_required()
 def get_habits():
     """Get all habits for current user"""
-    current_user_id = int(get_jwt_identity())
+    current_user_id = get_current_user_id()
     
     active_only = request.args.get('active_only', 'false').lower() == 'true'
     
-    query = Habit.query.filter_by(user_id=current_user_id)
+    # to_dict() embeds the routine; load them all in one extra query
+    query = Habit.query.filter_by(user_id=current_user_id)\
+        .options(selectinload(Habit.routine))
     if active_only:
         query = query.filter_by(is_active=True)
     
@@ -31,8 +51,8 @@ def get_habits():
 @jwt_required()
 def create_habit():
     """Create a new habit tracker"""
-    current_user_id = int(get_jwt_identity())
-    data = request.get_json()
+    current_user_id = get_current_user_id()
+    data = get_json_body()
     
     if not data:
         return jsonify({'error': 'No data provided'}), 400
@@ -57,7 +77,7 @@ def create_habit():
     )
     
     db.session.add(habit)
-    db.session.commit()
+    db.session.flush()
     
     return jsonify({
         'message': 'Habit created successfully',
@@ -69,13 +89,13 @@ def create_habit():
 @jwt_required()
 def update_habit(habit_id):
     """Update a habit"""
-    current_user_id = int(get_jwt_identity())
-    habit = Habit.query.filter_by(id=habit_id, user_id=current_user_id).first()
+    current_user_id = get_current_user_id()
+    habit = db.session.get(Habit, habit_id)
     
-    if not habit:
+    if habit is None or habit.user_id != current_user_id:
         return jsonify({'error': 'Habit not found'}), 404
     
-    data = request.get_json()
+    data = get_json_body()
     
     if not data:
         return jsonify({'error': 'No data provided'}), 400
@@ -95,7 +115,7 @@ def update_habit(habit_id):
     if 'is_active' in validated:
         habit.is_active = validated['is_active']
     
-    db.session.commit()
+    db.session.flush()
     
     return jsonify({
         'message': 'Habit updated successfully',
@@ -107,48 +127,49 @@ def update_habit(habit_id):
 @jwt_required()
 def complete_habit(habit_id):
     """Mark a habit as completed"""
-    current_user_id = int(get_jwt_identity())
-    habit = Habit.query.filter_by(id=habit_id, user_id=current_user_id).first()
-    
-    if not habit:
-        return jsonify({'error': 'Habit not found'}), 404
-    
+    current_user_id = get_current_user_id()
     now = datetime.utcnow()
     
-    # Update streak
-    if habit.last_completed_at:
-        hours_since_last = (now - habit.last_completed_at).total_seconds() / 3600
-        
-        # Check if within grace period (default 48 hours)
-        from flask import current_app
-        grace_period = current_app.config.get('DEFAULT_STREAK_GRACE_PERIOD_HOURS', 48)
-        
-        if hours_since_last <= grace_period:
-            habit.current_streak += 1
-        else:
-            # Streak broken, reset
-            habit.current_streak = 1
-    else:
-        habit.current_streak = 1
-    
-    # Update longest streak
-    if habit.current_streak > habit.longest_streak:
-        habit.longest_streak = habit.current_streak
+    # Streak continues if the last completion is within the grace period (default 48 hours);
+    # a first completion (NULL last_completed_at) starts it at 1
+    new_streak = case(
+        (Habit.last_completed_at >= now - _grace_period, Habit.current_streak + 1),
+        else_=1
+    )
     
-    # Update completion info
-    habit.total_completions += 1
-    habit.last_completed_at = now
+    # Read-modify-write in one atomic UPDATE ... RETURNING; concurrent completions
+    # cannot lose increments (SET expressions all see the pre-update row). The
+    # next reminder is computed from the row's schedule in the same statement.
+    habit = db.session.scalars(
+        update(Habit)
+        .where(Habit.id == habit_id, Habit.user_id == current_user_id)
+        .values(
+            current_streak=new_streak,
+            longest_streak=case(
+                (new_streak > Habit.longest_streak, new_streak),
+                else_=Habit.longest_streak
+            ),
+            total_completions=Habit.total_completions + 1,
+            last_completed_at=now,
+            next_reminder_at=case(
+                (Habit.schedule.is_(None), Habit.next_reminder_at),
+                else_=_next_reminder_sql(now)
+            )
+        )
+        .returning(Habit)
+        .execution_options(populate_existing=True)
+    ).first()
     
-    # Calculate next reminder
-    if habit.schedule:
-        habit.next_reminder_at = calculate_next_reminder(habit.schedule)
+    if not habit:
+        return jsonify({'error': 'Habit not found'}), 404
     
-    db.session.commit()
+    # The UPDATE above bypasses the ORM flush events that refresh the LLM context
+    after_commit(lambda: llm_service.invalidate_user_context(current_user_id))
     
     return jsonify({
         'message': 'Habit completed!',
         'habit': habit.to_dict(),
-        'streak_milestone': habit.current_streak in [7, 14, 30, 60, 90, 100, 365]
+        'streak_milestone': habit.current_streak in _MILESTONES
     }), 200
 
 
@@ -156,14 +177,13 @@ def complete_habit(habit_id):
 @jwt_required()
 def delete_habit(habit_id):
     """Delete a habit"""
-    current_user_id = int(get_jwt_identity())
-    habit = Habit.query.filter_by(id=habit_id, user_id=current_user_id).first()
+    current_user_id = get_current_user_id()
+    habit = db.session.get(Habit, habit_id)
     
-    if not habit:
+    if habit is None or habit.user_id != current_user_id:
         return jsonify({'error': 'Habit not found'}), 404
     
     db.session.delete(habit)
-    db.session.commit()
     
     return jsonify({'message': 'Habit deleted successfully'}), 200
 
@@ -172,14 +192,17 @@ def delete_habit(habit_id):
 @jwt_required()
 def get_upcoming_reminders():
     """Get upcoming reminders for the next 24 hours"""
-    current_user_id = int(get_jwt_identity())
+    current_user_id = get_current_user_id()
     
     lookahead_hours = request.args.get('hours', 24, type=int)
     now = datetime.utcnow()
     future = now + timedelta(hours=lookahead_hours)
     
+    # Served by ix_habit_user_active_reminder; the routine is the only relationship
+    # to_dict() touches, anything else would raise instead of lazy loading per row
     habits = Habit.query.filter_by(user_id=current_user_id, is_active=True)\
         .filter(Habit.next_reminder_at.between(now, future))\
+        .options(selectinload(Habit.routine), raiseload('*'))\
         .order_by(Habit.next_reminder_at.asc())\
         .all()
     
@@ -203,12 +226,45 @@ def calculate_next_reminder(schedule):
     if not schedule or not schedule.get('days') or not schedule.get('time'):
         return None
     
-    now = datetime.utcnow()
-    target_time = datetime.strptime(schedule['time'], '%H:%M').time()
+    # The result only depends on the schedule and the current minute
+    now_minute = int(time.time()) // 60
+    return _next_reminder_cached(tuple(sorted(schedule['days'])), schedule['time'], now_minute)
+
+
+def _next_reminder_sql(now):
+    """SQL twin of calculate_next_reminder() for the row's own schedule, as of `now`
+    
+    Each scheduled weekday is pushed to its next date (a week out when it is
+    today and the time has passed); the earliest one wins. NULL when the
+    schedule has no days or time, like the Python version.
+    """
+    now = now.replace(second=0, microsecond=0)
+    weekday = now.isoweekday()  # Monday=1, Sunday=7
+    day = func.json_array_elements_text(Habit.schedule['days']).table_valued('value').render_derived(name='schedule_day')
+    day_number = cast(day.c.value, Integer)
+    reminder_time = cast(Habit.schedule['time'].as_string(), Time)
+    days_until = func.mod(day_number - weekday + 7, 7) + case(
+        (and_(day_number == weekday, reminder_time <= now.time()), 7),
+        else_=0
+    )
+    return select(
+        func.min(cast(literal(now.date()), Date) + days_until + reminder_time)
+    ).select_from(day).scalar_subquery()
+
+
+@lru_cache(maxsize=256)
+def _parse_reminder_time(time_str):
+    return datetime.strptime(time_str, '%H:%M').time()
+
+
+@lru_cache(maxsize=4096)
+def _next_reminder_cached(days, time_str, now_minute):
+    """Next reminder for sorted schedule days at `time_str`, as of minute `now_minute`"""
+    now = datetime.utcfromtimestamp(now_minute * 60)
+    target_time = _parse_reminder_time(time_str)
     
     # Find next scheduled day
     current_weekday = now.isoweekday()  # Monday=1, Sunday=7
-    days = sorted(schedule['days'])
     
     # Try to find next occurrence this week
     next_day = None
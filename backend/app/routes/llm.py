@@ -1,7 +1,12 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.services.llm_service import llm_service
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from flask_jwt_extended import jwt_required
+from app.services.llm_service import llm_service, motivation_cache_key
+from app import db
 from app.models import LLMConversation
+from app.utils import (cache_get, cache_set, get_json_body, get_current_user_id, get_page_cursor, before_cursor,
+                       next_page_cursor)
+from sqlalchemy import desc, func, select
+import orjson
 import uuid
 
 bp = Blueprint('llm', __name__)
@@ -11,21 +16,20 @@ bp = Blueprint('llm', __name__)
 @jwt_required()
 def chat():
     """Send a message to the LLM and get a response"""
-    current_user_id = int(get_jwt_identity())
-    data = request.get_json()
+    if not llm_service.ready.wait(timeout=0):
+        return jsonify({'error': 'LLM service is starting, try again shortly'}), 503
     
-    print(f"DEBUG: Received data: {data}")
-    print(f"DEBUG: User ID: {current_user_id}")
+    current_user_id = get_current_user_id()
+    data = get_json_body()
     
     if not data or not data.get('message'):
-        print("DEBUG: Missing message in request")
         return jsonify({'error': 'Missing message'}), 400
     
     # Get or create session ID
     session_id = data.get('session_id') or str(uuid.uuid4())
     user_message = data['message']
     
-    print(f"DEBUG: Generating response for message: {user_message[:50]}...")
+    current_app.logger.debug("chat user=%s len=%s", current_user_id, len(user_message))
     
     try:
         # Generate response
@@ -35,8 +39,6 @@ def chat():
             session_id=session_id
         )
         
-        print(f"DEBUG: Got response: {response}")
-        
         return jsonify({
             'session_id': session_id,
             'message': response['message'],
@@ -44,19 +46,65 @@ def chat():
             'tokens_used': response.get('tokens_used', 0)
         }), 200
     except Exception as e:
-        print(f"DEBUG: Error generating response: {e}")
-        import traceback
-        traceback.print_exc()
+        current_app.logger.exception("chat failure")
         return jsonify({'error': str(e)}), 500
 
 
+@bp.route('/chat/stream', methods=['POST'])
+@jwt_required()
+def chat_stream():
+    """Send a message to the LLM and stream the reply as server-sent events
+    
+    Each chunk arrives as `data: {"delta": "..."}`; the stream ends with an
+    `event: done` carrying the session_id.
+    """
+    if not llm_service.ready.wait(timeout=0):
+        return jsonify({'error': 'LLM service is starting, try again shortly'}), 503
+    
+    current_user_id = get_current_user_id()
+    data = get_json_body()
+    
+    if not data or not data.get('message'):
+        return jsonify({'error': 'Missing message'}), 400
+    
+    session_id = data.get('session_id') or str(uuid.uuid4())
+    user_message = data['message']
+    
+    current_app.logger.debug("chat stream user=%s len=%s", current_user_id, len(user_message))
+    
+    def events():
+        stream = llm_service.stream_response(current_user_id, user_message, session_id)
+        try:
+            for text in stream:
+                yield b'data: ' + orjson.dumps({'delta': text}) + b'\n\n'
+        finally:
+            # On client disconnect this saves the partial reply while the
+            # request context is still active
+            stream.close()
+        yield b'event: done\ndata: ' + orjson.dumps({'session_id': session_id}) + b'\n\n'
+    
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @bp.route('/motivation', methods=['GET'])
 @jwt_required()
 def get_motivation():
     """Get a motivational message"""
-    current_user_id = int(get_jwt_identity())
+    if not llm_service.ready.wait(timeout=0):
+        return jsonify({'error': 'LLM service is starting, try again shortly'}), 503
+    
+    current_user_id = get_current_user_id()
     
-    message = llm_service.generate_motivation(current_user_id)
+    # Reuse a recent message; Redis being down just means calling the LLM
+    cache_key = motivation_cache_key(current_user_id)
+    message = cache_get(cache_key)
+    if message is None:
+        message = llm_service.generate_motivation(current_user_id)
+        cache_set(cache_key, message, current_app.config['MOTIVATION_CACHE_TTL'])
     
     return jsonify({
         'message': message
@@ -67,17 +115,35 @@ def get_motivation():
 @jwt_required()
 def get_conversation_history():
     """Get conversation history for a session"""
-    current_user_id = int(get_jwt_identity())
+    current_user_id = get_current_user_id()
     session_id = request.args.get('session_id', 'default')
+    # Pages are capped and continue from the (`before_ts` epoch seconds,
+    # `before_id`) cursor into older messages
     limit = request.args.get('limit', 50, type=int)
+    limit = max(1, min(limit, current_app.config['MAX_PAGE_SIZE']))
+    cursor, error = get_page_cursor()
+    if error:
+        return jsonify({'error': error}), 400
     
-    messages = LLMConversation.query.filter_by(
-        user_id=current_user_id,
-        session_id=session_id
-    ).order_by(LLMConversation.timestamp.desc()).limit(limit).all()
+    # Plain row mappings with the same keys as LLMConversation.to_dict()
+    stmt = select(
+        LLMConversation.id,
+        LLMConversation.role,
+        LLMConversation.content,
+        LLMConversation.timestamp
+    ).where(
+        LLMConversation.user_id == current_user_id,
+        LLMConversation.session_id == session_id
+    )
+    if cursor is not None:
+        stmt = stmt.where(before_cursor(LLMConversation.timestamp, LLMConversation.id, cursor))
+    messages = db.session.execute(
+        stmt.order_by(LLMConversation.timestamp.desc(), LLMConversation.id.desc()).limit(limit)
+    ).mappings().all()
     
     return jsonify({
-        'messages': [m.to_dict() for m in reversed(messages)]
+        'messages': [dict(m) for m in reversed(messages)],
+        **next_page_cursor(messages, limit, 'timestamp')
     }), 200
 
 
@@ -85,15 +151,18 @@ def get_conversation_history():
 @jwt_required()
 def get_chat_sessions():
     """Get all chat session IDs for current user"""
-    current_user_id = int(get_jwt_identity())
+    current_user_id = get_current_user_id()
     
-    # Get distinct session IDs
-    sessions = LLMConversation.query.filter_by(user_id=current_user_id)\
-        .distinct(LLMConversation.session_id)\
-        .order_by(LLMConversation.session_id, LLMConversation.timestamp.desc())\
+    # One row per session, most recently active first
+    rows = db.session.query(
+        LLMConversation.session_id,
+        func.max(LLMConversation.timestamp).label('last_message_at')
+    ).filter(LLMConversation.user_id == current_user_id)\
+        .group_by(LLMConversation.session_id)\
+        .order_by(desc('last_message_at'))\
         .all()
     
-    session_ids = list(set([s.session_id for s in sessions]))
+    session_ids = [row.session_id for row in rows]
     
     return jsonify({
         'sessions': session_ids
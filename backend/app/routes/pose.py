@@ -1,9 +1,11 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from app import db
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required
+from app import db, after_commit
 from app.models import PoseAnalysis, WorkoutSession
 from app.services.llm_service import llm_service
+from app.utils import run_in_background, get_json_body, get_current_user_id
 from datetime import datetime
+from sqlalchemy import exists, insert, literal, select, update
 
 bp = Blueprint('pose', __name__)
 
@@ -23,67 +25,82 @@ def analyze_pose():
         "range_of_motion": 90
     }
     """
-    current_user_id = int(get_jwt_identity())
-    data = request.get_json()
+    current_user_id = get_current_user_id()
+    data = get_json_body()
     
     if not data or not data.get('session_id') or not data.get('exercise_name'):
         return jsonify({'error': 'Missing required fields'}), 400
     
-    # Verify session belongs to user
-    session = WorkoutSession.query.filter_by(
-        id=data['session_id'],
-        user_id=current_user_id
-    ).first()
-    
-    if not session:
-        return jsonify({'error': 'Session not found'}), 404
-    
-    # Create pose analysis record
-    analysis = PoseAnalysis(
-        session_id=data['session_id'],
-        exercise_name=data['exercise_name'],
-        keypoints=data.get('keypoints', []),
-        form_score=data.get('form_score', 0),
-        rep_count=data.get('rep_count', 0),
-        range_of_motion=data.get('range_of_motion', 0)
-    )
-    
-    # Generate AI feedback
-    feedback = llm_service.analyze_pose_feedback(
-        user_id=current_user_id,
-        pose_data={
-            'form_score': analysis.form_score,
-            'rep_count': analysis.rep_count,
-            'range_of_motion': analysis.range_of_motion
-        },
-        exercise_name=analysis.exercise_name
+    # Insert only if the session belongs to the user: ownership check and write
+    # happen in one INSERT ... SELECT ... WHERE EXISTS round trip
+    values = {
+        'session_id': data['session_id'],
+        'exercise_name': data['exercise_name'],
+        'keypoints': data.get('keypoints', []),
+        'form_score': data.get('form_score', 0),
+        'rep_count': data.get('rep_count', 0),
+        'range_of_motion': data.get('range_of_motion', 0)
+    }
+    owned = exists().where(
+        WorkoutSession.id == data['session_id'],
+        WorkoutSession.user_id == current_user_id
     )
+    stmt = insert(PoseAnalysis).from_select(
+        list(values),
+        select(*(
+            literal(value, getattr(PoseAnalysis, column).type)
+            for column, value in values.items()
+        )).where(owned)
+    ).returning(PoseAnalysis)
+    analysis = db.session.scalars(stmt).first()
+    
+    if analysis is None:
+        return jsonify({'error': 'Session not found'}), 404
     
-    analysis.feedback_text = feedback
-    
-    db.session.add(analysis)
-    db.session.commit()
+    # AI feedback is filled in afterwards; clients read it from the session's analyses.
+    # The task writes from another session, so it starts once the insert is committed.
+    pose_data = {
+        'form_score': values['form_score'],
+        'rep_count': values['rep_count'],
+        'range_of_motion': values['range_of_motion']
+    }
+    analysis_id = analysis.id
+    after_commit(lambda: run_in_background(
+        _store_pose_feedback, analysis_id, current_user_id, pose_data, values['exercise_name']
+    ))
     
     return jsonify({
         'message': 'Pose analyzed successfully',
         'analysis': analysis.to_dict(),
-        'feedback': feedback
+        'feedback': None,
+        'feedback_pending': True
     }), 201
 
 
+def _store_pose_feedback(analysis_id, user_id, pose_data, exercise_name):
+    """Generate LLM feedback for a saved analysis and write it back"""
+    feedback = llm_service.analyze_pose_feedback(
+        user_id=user_id,
+        pose_data=pose_data,
+        exercise_name=exercise_name
+    )
+    db.session.execute(
+        update(PoseAnalysis)
+        .where(PoseAnalysis.id == analysis_id)
+        .values(feedback_text=feedback)
+    )
+
+
 @bp.route('/session/<int:session_id>/analyses', methods=['GET'])
 @jwt_required()
 def get_session_analyses(session_id):
     """Get all pose analyses for a workout session"""
-    current_user_id = int(get_jwt_identity())
+    current_user_id = get_current_user_id()
     
     # Verify session belongs to user
-    session = WorkoutSession.query.filter_by(
-        id=session_id,
-        user_id=current_user_id
-    ).first()
+    session = db.session.get(WorkoutSession, session_id)
     
-    if not session:
+    if session is None or session.user_id != current_user_id:
         return jsonify({'error': 'Session not found'}), 404
     
     analyses = PoseAnalysis.query.filter_by(session_id=session_id)\
@@ -102,8 +119,11 @@ def get_pose_feedback():
     
     Useful for live camera workouts before final analysis
     """
-    current_user_id = int(get_jwt_identity())
-    data = request.get_json()
+    if not llm_service.ready.wait(timeout=0):
+        return jsonify({'error': 'LLM service is starting, try again shortly'}), 503
+    
+    current_user_id = get_current_user_id()
+    data = get_json_body()
     
     if not data or not data.get('exercise_name'):
         return jsonify({'error': 'Missing exercise_name'}), 400
@@ -1,9 +1,13 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from app import db
+from flask import Blueprint, current_app, request, jsonify
+from flask_jwt_extended import jwt_required
+from app import db, after_commit
 from app.models import WorkoutRoutine, WorkoutSession
-from app.utils import validate_workout_routine, validate_workout_session, ValidationError
+from app.utils import (validate_workout_routine, validate_workout_session, ValidationError, cache_delete, get_json_body,
+                       get_current_user_id, get_page_cursor, before_cursor, next_page_cursor)
+from app.services.llm_service import motivation_cache_key
 from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.orm import selectinload
 
 bp = Blueprint('workouts', __name__)
 
@@ -12,7 +16,7 @@ bp = Blueprint('workouts', __name__)
 @jwt_required()
 def get_routines():
     """Get all workout routines for current user"""
-    current_user_id = int(get_jwt_identity())
+    current_user_id = get_current_user_id()
     routines = WorkoutRoutine.query.filter_by(user_id=current_user_id).all()
     
     return jsonify({
@@ -24,8 +28,8 @@ def get_routines():
 @jwt_required()
 def create_routine():
     """Create a new workout routine"""
-    current_user_id = int(get_jwt_identity())
-    data = request.get_json()
+    current_user_id = get_current_user_id()
+    data = get_json_body()
     
     if not data:
         return jsonify({'error': 'No data provided'}), 400
@@ -46,7 +50,7 @@ def create_routine():
     )
     
     db.session.add(routine)
-    db.session.commit()
+    db.session.flush()
     
     return jsonify({
         'message': 'Routine created successfully',
@@ -58,10 +62,10 @@ def create_routine():
 @jwt_required()
 def get_routine(routine_id):
     """Get a specific workout routine"""
-    current_user_id = int(get_jwt_identity())
-    routine = WorkoutRoutine.query.filter_by(id=routine_id, user_id=current_user_id).first()
+    current_user_id = get_current_user_id()
+    routine = db.session.get(WorkoutRoutine, routine_id)
     
-    if not routine:
+    if routine is None or routine.user_id != current_user_id:
         return jsonify({'error': 'Routine not found'}), 404
     
     return jsonify({'routine': routine.to_dict()}), 200
@@ -71,13 +75,13 @@ def get_routine(routine_id):
 @jwt_required()
 def update_routine(routine_id):
     """Update a workout routine"""
-    current_user_id = int(get_jwt_identity())
-    routine = WorkoutRoutine.query.filter_by(id=routine_id, user_id=current_user_id).first()
+    current_user_id = get_current_user_id()
+    routine = db.session.get(WorkoutRoutine, routine_id)
     
-    if not routine:
+    if routine is None or routine.user_id != current_user_id:
         return jsonify({'error': 'Routine not found'}), 404
     
-    data = request.get_json()
+    data = get_json_body()
     
     if not data:
         return jsonify({'error': 'No data provided'}), 400
@@ -102,7 +106,7 @@ def update_routine(routine_id):
         routine.is_camera_based = validated['is_camera_based']
     
     routine.updated_at = datetime.utcnow()
-    db.session.commit()
+    db.session.flush()
     
     return jsonify({
         'message': 'Routine updated successfully',
@@ -114,14 +118,13 @@ def update_routine(routine_id):
 @jwt_required()
 def delete_routine(routine_id):
     """Delete a workout routine"""
-    current_user_id = int(get_jwt_identity())
-    routine = WorkoutRoutine.query.filter_by(id=routine_id, user_id=current_user_id).first()
+    current_user_id = get_current_user_id()
+    routine = db.session.get(WorkoutRoutine, routine_id)
     
-    if not routine:
+    if routine is None or routine.user_id != current_user_id:
         return jsonify({'error': 'Routine not found'}), 404
     
     db.session.delete(routine)
-    db.session.commit()
     
     return jsonify({'message': 'Routine deleted successfully'}), 200
 
@@ -130,18 +133,28 @@ def delete_routine(routine_id):
 @jwt_required()
 def get_sessions():
     """Get workout sessions for current user"""
-    current_user_id = int(get_jwt_identity())
+    current_user_id = get_current_user_id()
     
-    # Optional filters
+    # Optional filters; pages are capped and continue from the
+    # (`before_ts` epoch seconds, `before_id`) cursor of the previous page
     limit = request.args.get('limit', 20, type=int)
-    
-    sessions = WorkoutSession.query.filter_by(user_id=current_user_id)\
-        .order_by(WorkoutSession.started_at.desc())\
+    limit = max(1, min(limit, current_app.config['MAX_PAGE_SIZE']))
+    cursor, error = get_page_cursor()
+    if error:
+        return jsonify({'error': error}), 400
+    
+    # to_dict() embeds the routine; load them all in one extra query
+    query = WorkoutSession.query.filter_by(user_id=current_user_id)\
+        .options(selectinload(WorkoutSession.routine))
+    if cursor is not None:
+        query = query.filter(before_cursor(WorkoutSession.started_at, WorkoutSession.id, cursor))
+    sessions = query.order_by(WorkoutSession.started_at.desc(), WorkoutSession.id.desc())\
         .limit(limit)\
         .all()
     
     return jsonify({
-        'sessions': [s.to_dict() for s in sessions]
+        'sessions': [s.to_dict() for s in sessions],
+        **next_page_cursor(sessions, limit, 'started_at')
     }), 200
 
 
@@ -149,8 +162,8 @@ def get_sessions():
 @jwt_required()
 def create_session():
     """Create a new workout session (manual entry)"""
-    current_user_id = int(get_jwt_identity())
-    data = request.get_json()
+    current_user_id = get_current_user_id()
+    data = get_json_body()
     
     if not data:
         return jsonify({'error': 'No data provided'}), 400
@@ -173,7 +186,10 @@ def create_session():
     )
     
     db.session.add(session)
-    db.session.commit()
+    db.session.flush()
+    
+    # Weekly workout count feeds the motivation message
+    after_commit(lambda: cache_delete(motivation_cache_key(current_user_id)))
     
     return jsonify({
         'message': 'Session created successfully',
@@ -185,13 +201,13 @@ def create_session():
 @jwt_required()
 def update_session(session_id):
     """Update a workout session"""
-    current_user_id = int(get_jwt_identity())
-    session = WorkoutSession.query.filter_by(id=session_id, user_id=current_user_id).first()
+    current_user_id = get_current_user_id()
+    session = db.session.get(WorkoutSession, session_id)
     
-    if not session:
+    if session is None or session.user_id != current_user_id:
         return jsonify({'error': 'Session not found'}), 404
     
-    data = request.get_json()
+    data = get_json_body()
     
     if not data:
         return jsonify({'error': 'No data provided'}), 400
@@ -213,7 +229,10 @@ def update_session(session_id):
     if 'notes' in validated:
         session.notes = validated['notes']
     
-    db.session.commit()
+    db.session.flush()
+    
+    # Weekly workout count feeds the motivation message
+    after_commit(lambda: cache_delete(motivation_cache_key(current_user_id)))
     
     return jsonify({
         'message': 'Session updated successfully',
@@ -225,14 +244,16 @@ def update_session(session_id):
 @jwt_required()
 def delete_session(session_id):
     """Delete a workout session"""
-    current_user_id = int(get_jwt_identity())
-    session = WorkoutSession.query.filter_by(id=session_id, user_id=current_user_id).first()
+    current_user_id = get_current_user_id()
+    session = db.session.get(WorkoutSession, session_id)
     
-    if not session:
+    if session is None or session.user_id != current_user_id:
         return jsonify({'error': 'Session not found'}), 404
     
     db.session.delete(session)
-    db.session.commit()
+    
+    # Weekly workout count feeds the motivation message
+    after_commit(lambda: cache_delete(motivation_cache_key(current_user_id)))
     
     return jsonify({'message': 'Session deleted successfully'}), 200
 
@@ -241,16 +262,15 @@ def delete_session(session_id):
 @jwt_required()
 def get_stats():
     """Get workout statistics for current user"""
-    current_user_id = int(get_jwt_identity())
-    
-    total_sessions = WorkoutSession.query.filter_by(user_id=current_user_id).count()
-    completed_sessions = WorkoutSession.query.filter_by(user_id=current_user_id)\
-        .filter(WorkoutSession.completed_at.isnot(None)).count()
-    
-    # Total time
-    sessions = WorkoutSession.query.filter_by(user_id=current_user_id).all()
-    total_minutes = sum(s.duration_minutes for s in sessions if s.duration_minutes)
-    total_calories = sum(s.calories_burned for s in sessions if s.calories_burned)
+    current_user_id = get_current_user_id()
+    
+    # Counts and totals in one aggregate query instead of loading every session
+    total_sessions, completed_sessions, total_minutes, total_calories = db.session.query(
+        func.count(),
+        func.count(WorkoutSession.completed_at),
+        func.coalesce(func.sum(WorkoutSession.duration_minutes), 0),
+        func.coalesce(func.sum(WorkoutSession.calories_burned), 0)
+    ).filter(WorkoutSession.user_id == current_user_id).one()
     
     return jsonify({
         'total_sessions': total_sessions,
@@ -0,0 +1,158 @@
+"""
+Conversation Writer - persists chat messages off the request path
+Messages are queued and inserted in batches by a single background thread.
+"""
+
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+
+import orjson
+from flask import current_app
+
+from app import db
+from app.models import LLMConversation
+from app.utils import cache_list_push
+
+# Flush when this many rows are queued, or this long after the first one arrived
+BATCH_SIZE = 50
+BATCH_WINDOW = 0.1  # seconds
+
+_STOP = object()
+
+
+def conversation_history_key(user_id):
+    """Redis list mirroring a user's latest chat messages, newest first"""
+    return f"user:{user_id}:history"
+
+
+class ConversationWriter:
+    """Background batch writer for LLMConversation rows
+
+    Delivery is at-most-once: a failed batch is logged and dropped, and rows
+    still queued when the process is killed are lost. A normal interpreter
+    exit drains the queue first.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._app = None
+        self._lock = threading.Lock()
+
+    def enqueue(self, user_id, session_id, user_message, assistant_message, tokens, model, asked_at):
+        """Queue both sides of an exchange for insertion
+
+        Timestamps are taken now (the reply) and from `asked_at` (the question)
+        rather than at insert time, so batching never reorders a conversation.
+        Returns a Future resolved with the two row ids once they are committed
+        (an empty list if the batch was dropped).
+        """
+        self._ensure_started()
+        session_id = session_id or 'default'
+        answered_at = datetime.utcnow()
+        written = Future()
+        for role, content, timestamp in (
+            ('user', user_message, asked_at),
+            ('assistant', assistant_message, answered_at)
+        ):
+            self._queue.put(({
+                'user_id': user_id,
+                'session_id': session_id,
+                'role': role,
+                'content': content,
+                'tokens_used': tokens // 2,
+                'model': model,
+                'timestamp': timestamp
+            }, written))
+        return written
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._app = current_app._get_current_object()
+                self._thread = threading.Thread(target=self._run, name='conversation-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self._stop)
+
+    def _stop(self):
+        self._queue.put(_STOP)
+        self._thread.join(timeout=5)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + BATCH_WINDOW
+            while len(batch) < BATCH_SIZE:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._write(batch)
+
+        # Drain whatever was queued behind the stop marker
+        remaining = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                remaining.append(item)
+        if remaining:
+            self._write(remaining)
+
+    def _write(self, batch):
+        """Insert one batch, then prepend it to each user's Redis history mirror"""
+        written = {}
+        with self._app.app_context():
+            try:
+                rows = [LLMConversation(**values) for values, _ in batch]
+                db.session.add_all(rows)
+                # Ids are read after the flush; after commit they'd be expired
+                db.session.flush()
+                pushes = {}
+                for row, (values, future) in zip(rows, batch):
+                    written.setdefault(future, []).append(row.id)
+                    pushes.setdefault(values['user_id'], []).append(orjson.dumps({
+                        'id': row.id,
+                        'role': values['role'],
+                        'content': values['content']
+                    }).decode())
+                db.session.commit()
+                for future, ids in written.items():
+                    future.set_result(ids)
+
+                for user_id, messages in pushes.items():
+                    cache_list_push(
+                        conversation_history_key(user_id),
+                        messages,
+                        current_app.config['MAX_CONVERSATION_HISTORY'],
+                        current_app.config['CONVERSATION_HISTORY_CACHE_TTL']
+                    )
+            except Exception:
+                db.session.rollback()
+                current_app.logger.exception("Failed to write %d conversation messages", len(batch))
+                for _, future in batch:
+                    if not future.done():
+                        future.set_result([])
+
+
+# Global instance
+conversation_writer = ConversationWriter()
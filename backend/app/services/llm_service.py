@@ -4,11 +4,112 @@ Uses Google Gemini 1.5 Flash - 1500 requests/day FREE
 """
 
 import google.generativeai as genai
+from cachetools import TTLCache
 from flask import current_app
 from app.models import LLMConversation, User, WorkoutSession, Habit
 from app import db
+from app.services.conversation_writer import conversation_writer, conversation_history_key
+from app.utils import (cache_get, cache_set, cache_counter, cache_incr, cache_list_range, cache_list_version,
+                       cache_list_fill, run_in_background)
+from concurrent.futures import Future
 from datetime import datetime, timedelta
-import json
+from sqlalchemy import event, func, select, update
+from sqlalchemy.orm import Session, object_session
+import asyncio
+import orjson
+import re
+import threading
+import time
+
+
+# System prompt for fitness coaching
+COACH_SYSTEM_PROMPT = """You are an enthusiastic and knowledgeable fitness coach AI assistant. 
+Your role is to:
+- Provide personalized workout advice and motivation
+- Analyze workout performance and give constructive feedback
+- Help users maintain healthy habits and track progress
+- Encourage users while being realistic about fitness goals
+- Answer questions about exercise form, nutrition, and fitness
+- REMEMBER and reference information from the "Recent Conversation" section below
+- If the user has told you their height, weight, or other personal info in recent messages, USE that information
+
+Be supportive, positive, and concise in your responses. Use the user's context and conversation history to personalize your advice."""
+
+def motivation_cache_key(user_id):
+    """Redis key holding a user's cached motivation message"""
+    return f"user:{user_id}:motivation"
+
+
+def context_version_key(user_id):
+    """Redis counter bumped whenever a user's cached context sections go stale"""
+    return f"user:{user_id}:context_version"
+
+
+def pose_feedback_cache_key(exercise_name, pose_data):
+    """Redis key for feedback on similar pose results, or None if they aren't numeric
+    
+    Scores, reps and range of motion are bucketed to the nearest 10 so nearby
+    results share one generated message across users.
+    """
+    try:
+        buckets = ':'.join(
+            str(int(round(float(pose_data.get(field) or 0), -1)))
+            for field in ('form_score', 'rep_count', 'range_of_motion')
+        )
+    except (TypeError, ValueError):
+        return None
+    return f"pose_feedback:{str(exercise_name).strip().lower()}:{buckets}"
+
+
+# Gemini chats kept per (user_id, session_id) so follow-up turns skip rebuilding context
+CHAT_SESSION_CACHE_SIZE = 10000
+CHAT_SESSION_TTL = 1800  # seconds
+
+# Profile, workout and habit sections of the context change far less often than
+# the conversation, so they are cached per user in each worker. Entries are tagged
+# with the user's Redis context version, which commits touching those rows bump,
+# so every worker sees the change; without Redis nothing is cached.
+CONTEXT_CACHE_SIZE = 50000
+CONTEXT_CACHE_TTL = 300  # seconds
+# Must outlive CONTEXT_CACHE_TTL so an expired counter can't match an old entry
+CONTEXT_VERSION_TTL = 86400  # seconds
+
+# Keywords marking a message as being only about workouts or only about habits;
+# messages matching neither (or both) get the full context
+_INTENT_PATTERNS = {
+    'workouts': re.compile(r'\b(workouts?|exercises?|reps?|sets?|training|calories)\b', re.IGNORECASE),
+    'habits': re.compile(r'\b(habits?|streaks?|routines?|reminders?)\b', re.IGNORECASE),
+}
+
+
+def _message_intents(message):
+    """Context sections a chat message asks about"""
+    return {name for name, pattern in _INTENT_PATTERNS.items() if pattern.search(message)}
+
+
+def _estimate_tokens(text):
+    """Rough token count (~4 characters per token for English with Gemini/Llama)"""
+    return len(text) // 4 + 1
+
+
+def _pose_feedback_prompt(pose_data, exercise_name):
+    """Single-result pose feedback prompt"""
+    return f"""Analyze this workout pose data and provide brief, actionable feedback:
+
+Exercise: {exercise_name}
+Form Score: {pose_data.get('form_score', 0)}/100
+Rep Count: {pose_data.get('rep_count', 0)}
+Range of Motion: {pose_data.get('range_of_motion', 0)}
+
+Provide:
+1. One sentence on form quality
+2. One specific improvement tip (if score < 80)
+3. Encouragement
+
+Keep response under 100 words."""
+
+
+FALLBACK_CHAT_MESSAGE = "I'm having trouble connecting right now, but I'm here to help! Try again in a moment."
 
 
 class LLMService:
@@ -17,6 +118,23 @@ class LLMService:
     def __init__(self):
         self.model = None
         self.use_ollama = False
+        # Set once background initialization has finished (successfully or not)
+        self.ready = threading.Event()
+        # Async provider calls share one long-lived event loop so the async
+        # Gemini/Ollama clients stay bound to the same loop across requests
+        self._loop = None
+        self._loop_lock = threading.Lock()
+        self._chat_sessions = TTLCache(maxsize=CHAT_SESSION_CACHE_SIZE, ttl=CHAT_SESSION_TTL)
+        self._chat_sessions_lock = threading.Lock()
+        self._context_cache = TTLCache(maxsize=CONTEXT_CACHE_SIZE, ttl=CONTEXT_CACHE_TTL)
+        self._context_cache_lock = threading.Lock()
+        self._pending_summaries = set()
+        self._pending_summaries_lock = threading.Lock()
+        # user_id -> [(pose_data, exercise_name, Future)] waiting for the batch window
+        self._pose_batches = {}
+        # user_id -> pose feedback requests currently being answered
+        self._pose_in_flight = {}
+        self._pose_batches_lock = threading.Lock()
     
     def initialize(self):
         """Initialize Gemini API or Ollama"""
@@ -24,9 +142,19 @@ class LLMService:
             if current_app.config.get('USE_OLLAMA'):
                 self.use_ollama = True
                 # Ollama setup (if available)
+                import httpx
                 import ollama
+                # One keep-alive pool per client, reused by every request
+                pool_size = current_app.config['LLM_HTTP_POOL_SIZE']
+                http_options = {
+                    'timeout': current_app.config['LLM_HTTP_TIMEOUT'],
+                    'limits': httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+                }
                 self.ollama_client = ollama.Client(
-                    host=current_app.config['OLLAMA_BASE_URL']
+                    host=current_app.config['OLLAMA_BASE_URL'], **http_options
+                )
+                self.ollama_async = ollama.AsyncClient(
+                    host=current_app.config['OLLAMA_BASE_URL'], **http_options
                 )
                 current_app.logger.info("Using Ollama for LLM (100% free, local)")
             else:
@@ -40,11 +168,128 @@ class LLMService:
             # Fallback to mock responses in case of error
             self.model = None
     
-    def get_user_context(self, user_id, session_id=None):
-        """Build context from user profile, recent workouts, and habits"""
-        user = User.query.get(user_id)
-        if not user:
-            return ""
+    def get_user_context(self, user_id, session_id=None, user_message=None):
+        """Build context from user profile, recent workouts, and habits
+        
+        When `user_message` clearly asks about workouts or habits only, the other
+        section is left out (and not queried); otherwise everything is included.
+        """
+        intents = _message_intents(user_message) if user_message else set()
+        sections = ('workouts', 'habits') if not intents else tuple(
+            section for section in ('workouts', 'habits') if section in intents
+        )
+        
+        # Read before building, so a bump during the build leaves this entry stale
+        version = cache_counter(context_version_key(user_id))
+        cached = {}
+        if version is not None:
+            with self._context_cache_lock:
+                entry = self._context_cache.get(user_id)
+            if entry is not None and entry[0] == version:
+                cached = dict(entry[1])
+        
+        missing = [name for name in ('profile', *sections) if name not in cached]
+        if missing:
+            if 'profile' in missing or 'habits' in missing:
+                built = self._build_profile_sections(user_id)
+                if built is None:
+                    return ""
+                cached.update(built)
+            if 'workouts' in missing:
+                cached['workouts'] = self._build_workouts_section(user_id)
+            if version is not None:
+                with self._context_cache_lock:
+                    self._context_cache[user_id] = (version, cached)
+        
+        context_parts = [cached['profile']]
+        context_parts.extend(cached[name] for name in sections if cached[name])
+        
+        # Conversation history - load from ALL sessions for continuity; messages
+        # already folded into the memory summary are skipped
+        memory_upto = cached['memory_upto'] or 0
+        history = [msg for msg in self._recent_messages(user_id) if msg['id'] > memory_upto]
+        
+        if len(history) >= current_app.config['MEMORY_SUMMARIZE_AFTER']:
+            self._schedule_memory_summary(user_id)
+        
+        # Newest messages first until MAX_CONTEXT_TOKENS (less the system prompt,
+        # profile and sections) is used up
+        budget = current_app.config['MAX_CONTEXT_TOKENS'] - _estimate_tokens(COACH_SYSTEM_PROMPT) - sum(
+            _estimate_tokens(part) for part in context_parts
+        )
+        lines = []
+        for msg in history:
+            line = f"{msg['role']}: {msg['content']}"
+            budget -= _estimate_tokens(line)
+            if budget < 0:
+                break
+            lines.append(line)
+        
+        if lines:
+            context_parts.append("\nRecent Conversation:")
+            context_parts.extend(reversed(lines))
+        
+        return "\n".join(context_parts)
+    
+    def _recent_messages(self, user_id):
+        """Latest MAX_CONVERSATION_HISTORY messages as dicts, newest first
+        
+        Served from the Redis mirror when present; otherwise read from the
+        database and used to fill the mirror.
+        """
+        limit = current_app.config['MAX_CONVERSATION_HISTORY']
+        key = conversation_history_key(user_id)
+        
+        cached = cache_list_range(key, 0, limit - 1)
+        if cached is not None:
+            return [orjson.loads(item) for item in cached]
+        
+        # Read before the rows, so a batch written meanwhile cancels the fill
+        version = cache_list_version(key)
+        messages = [
+            dict(row) for row in db.session.execute(
+                select(LLMConversation.id, LLMConversation.role, LLMConversation.content)
+                .where(LLMConversation.user_id == user_id)
+                .order_by(LLMConversation.timestamp.desc())
+                .limit(limit)
+            ).mappings()
+        ]
+        cache_list_fill(
+            key,
+            [orjson.dumps(msg).decode() for msg in messages],
+            current_app.config['CONVERSATION_HISTORY_CACHE_TTL'],
+            version
+        )
+        return messages
+    
+    def invalidate_user_context(self, user_id):
+        """Drop a user's cached profile/workout/habit context in every worker
+        
+        Call it after the change is committed; bumping the version earlier
+        lets another worker cache the old rows under the new version.
+        """
+        self._forget_user_context(user_id)
+        cache_incr(context_version_key(user_id), CONTEXT_VERSION_TTL)
+    
+    def _forget_user_context(self, user_id):
+        """Drop this worker's cached context for a user"""
+        with self._context_cache_lock:
+            self._context_cache.pop(user_id, None)
+    
+    def _build_profile_sections(self, user_id):
+        """Profile and active habit sections, or None for an unknown user"""
+        # Profile and active habits in one round trip (one row per habit, or a
+        # single row with no habit)
+        rows = db.session.execute(
+            select(User, Habit)
+            .outerjoin(Habit, (Habit.user_id == User.id) & Habit.is_active.is_(True))
+            .where(User.id == user_id)
+            .order_by(Habit.id)
+        ).all()
+        if not rows:
+            return None
+        user = rows[0].User
+        active_habits = [row.Habit for row in rows if row.Habit is not None]
         
         # User profile
         context_parts = [
@@ -52,22 +297,108 @@ class LLMService:
             f"Fitness Level: {user.fitness_level or 'beginner'}",
         ]
         
-        if user.goals:
-            goals = json.loads(user.goals) if isinstance(user.goals, str) else user.goals
+        goals = user.goals_list
+        if goals:
             context_parts.append(f"Goals: {', '.join(goals)}")
         
-        # Recent workout sessions (last 5)
-        recent_sessions = WorkoutSession.query.filter_by(user_id=user_id)\
-            .filter(WorkoutSession.completed_at.isnot(None))\
-            .order_by(WorkoutSession.completed_at.desc())\
-            .limit(5)\
-            .all()
+        if user.memory_summary:
+            context_parts.append(f"\nFrom Earlier Conversations:\n{user.memory_summary}")
+        
+        # Active habits
+        habit_parts = []
+        if active_habits:
+            habit_parts.append("\nActive Habits:")
+            for habit in active_habits:
+                habit_parts.append(
+                    f"- {habit.name}: {habit.current_streak} day streak, "
+                    f"{habit.total_completions} total completions"
+                )
+        
+        return {
+            'profile': "\n".join(context_parts),
+            'habits': "\n".join(habit_parts),
+            'memory_upto': user.memory_summary_upto
+        }
+    
+    def _schedule_memory_summary(self, user_id):
+        """Fold older messages into the user's memory summary after the response"""
+        with self._pending_summaries_lock:
+            if user_id in self._pending_summaries:
+                return
+            self._pending_summaries.add(user_id)
+        run_in_background(self._summarize_memory, user_id)
+    
+    def _summarize_memory(self, user_id):
+        """Merge all but the latest messages into User.memory_summary (background task)"""
+        try:
+            user = db.session.get(User, user_id)
+            if user is None:
+                return
+            upto = user.memory_summary_upto
+            
+            # Oldest-first, capped so a long unsummarized backlog can't blow up the prompt
+            messages = db.session.execute(
+                select(LLMConversation.id, LLMConversation.role, LLMConversation.content)
+                .where(LLMConversation.user_id == user_id, LLMConversation.id > (upto or 0))
+                .order_by(LLMConversation.id.desc())
+                .limit(100)
+            ).all()[::-1]
+            older = messages[:-current_app.config['MEMORY_RECENT_MESSAGES']]
+            if not older:
+                return
+            
+            transcript = "\n".join(f"{msg.role}: {msg.content}" for msg in older)
+            prompt = f"""Update the list of facts about a fitness app user with anything new from the conversation below.
+Keep personal details they shared (height, weight, injuries, preferences, schedule, goals) and drop small talk.
+Reply with the updated list only, one short bullet per fact, under 150 words.
+
+Current facts:
+{user.memory_summary or '(none)'}
+
+Conversation:
+{transcript}"""
+            summary = self._generate_text(prompt).strip()
+            
+            # Only write if no other worker advanced the watermark meanwhile;
+            # updated_at is kept since this isn't a profile edit
+            db.session.execute(
+                update(User)
+                .where(User.id == user_id, User.memory_summary_upto.is_not_distinct_from(upto))
+                .values(
+                    memory_summary=summary,
+                    memory_summary_upto=older[-1].id,
+                    updated_at=User.updated_at
+                )
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            self.invalidate_user_context(user_id)
+        finally:
+            with self._pending_summaries_lock:
+                self._pending_summaries.discard(user_id)
+    
+    def _build_workouts_section(self, user_id):
+        """Recent workouts section ('' when the user has none)"""
+        # Recent workout sessions (last 5); served by ix_workout_sessions_user_id_completed_at
+        recent_sessions = db.session.execute(
+            select(
+                WorkoutSession.completed_at,
+                WorkoutSession.duration_minutes,
+                WorkoutSession.calories_burned,
+                WorkoutSession.exercises_completed,
+                WorkoutSession.notes
+            )
+            .where(WorkoutSession.user_id == user_id, WorkoutSession.completed_at.isnot(None))
+            .order_by(WorkoutSession.completed_at.desc())
+            .limit(5)
+        ).all()
         
+        context_parts = []
         if recent_sessions:
             context_parts.append("\nRecent Workouts:")
             for session in recent_sessions:
-                workout_info = f"- {session.completed_at.strftime('%Y-%m-%d')}: "
-                workout_info += f"{session.duration_minutes} min"
+                # isoformat() slicing avoids strftime's format parsing
+                workout_info = f"- {session.completed_at.isoformat()[:10]}: {session.duration_minutes} min"
                 
                 if session.calories_burned:
                     workout_info += f", {session.calories_burned} cal"
@@ -79,60 +410,26 @@ class LLMService:
                         workout_info += f" - Exercises: {', '.join(exercise_names)}"
                 
                 # Add notes if available
-                if session.notes:
-                    workout_info += f" (Notes: {session.notes[:50]}{'...' if len(session.notes) > 50 else ''})"
+                notes = session.notes
+                if notes:
+                    workout_info += f" (Notes: {notes[:50] + '...' if len(notes) > 50 else notes})"
                 
                 context_parts.append(workout_info)
         
-        # Active habits
-        active_habits = Habit.query.filter_by(user_id=user_id, is_active=True).all()
-        if active_habits:
-            context_parts.append("\nActive Habits:")
-            for habit in active_habits:
-                context_parts.append(
-                    f"- {habit.name}: {habit.current_streak} day streak, "
-                    f"{habit.total_completions} total completions"
-                )
-        
-        # Conversation history - load from ALL sessions for continuity
-        history = LLMConversation.query.filter_by(user_id=user_id)\
-            .order_by(LLMConversation.timestamp.desc())\
-            .limit(current_app.config['MAX_CONVERSATION_HISTORY'])\
-            .all()
-        
-        if history:
-            context_parts.append("\nRecent Conversation:")
-            for msg in reversed(history):
-                context_parts.append(f"{msg.role}: {msg.content}")
-        
         return "\n".join(context_parts)
     
     def generate_response(self, user_id, user_message, session_id=None):
         """Generate LLM response with full context"""
-        if not self.model and not self.use_ollama:
+        asked_at = datetime.utcnow()
+        if self.ready.is_set() and not self.model and not self.use_ollama:
             self.initialize()
         
-        # Build context
-        context = self.get_user_context(user_id, session_id)
-        
-        # System prompt for fitness coaching
-        system_prompt = """You are an enthusiastic and knowledgeable fitness coach AI assistant. 
-Your role is to:
-- Provide personalized workout advice and motivation
-- Analyze workout performance and give constructive feedback
-- Help users maintain healthy habits and track progress
-- Encourage users while being realistic about fitness goals
-- Answer questions about exercise form, nutrition, and fitness
-- REMEMBER and reference information from the "Recent Conversation" section below
-- If the user has told you their height, weight, or other personal info in recent messages, USE that information
-
-Be supportive, positive, and concise in your responses. Use the user's context and conversation history to personalize your advice."""
-        
-        # Construct full prompt
-        full_prompt = f"{system_prompt}\n\n{context}\n\nUser: {user_message}\n\nAssistant:"
+        system_prompt = COACH_SYSTEM_PROMPT
         
         try:
             if self.use_ollama:
+                context = self.get_user_context(user_id, session_id, user_message)
+                
                 # Ollama API call
                 response = self.ollama_client.chat(
                     model=current_app.config['OLLAMA_MODEL'],
@@ -145,17 +442,23 @@ Be supportive, positive, and concise in your responses. Use the user's context a
                 model_used = current_app.config['OLLAMA_MODEL']
                 tokens_used = 0  # Ollama doesn't track tokens
             else:
-                # Google Gemini API call (FREE)
-                response = self.model.generate_content(full_prompt)
+                # Google Gemini API call (FREE); only the new turn is added to the chat
+                chat, seen_id, pending = self._take_chat_session(user_id, session_id)
+                response = chat.send_message(user_message)
                 assistant_message = response.text
                 model_used = current_app.config['GEMINI_MODEL']
                 
                 # Estimate tokens (Gemini doesn't return exact count in free tier)
-                tokens_used = len(full_prompt.split()) + len(assistant_message.split())
+                tokens_used = sum(
+                    len(part.text.split()) for content in chat.history for part in content.parts
+                )
             
             # Save conversation to database
-            self._save_conversation(user_id, session_id, 'user', user_message, tokens_used // 2, model_used)
-            self._save_conversation(user_id, session_id, 'assistant', assistant_message, tokens_used // 2, model_used)
+            written = self._save_conversation_pair(
+                user_id, session_id, user_message, assistant_message, tokens_used, model_used, asked_at
+            )
+            if not self.use_ollama:
+                self._return_chat_session(user_id, session_id, chat, seen_id, [*pending, written])
             
             return {
                 'message': assistant_message,
@@ -167,42 +470,136 @@ Be supportive, positive, and concise in your responses. Use the user's context a
             current_app.logger.error(f"Error generating LLM response: {e}")
             # Fallback response
             return {
-                'message': "I'm having trouble connecting right now, but I'm here to help! Try again in a moment.",
+                'message': FALLBACK_CHAT_MESSAGE,
                 'model': 'fallback',
                 'error': str(e)
             }
     
-    def analyze_pose_feedback(self, user_id, pose_data, exercise_name):
-        """Generate feedback based on pose detection results"""
-        if not self.model and not self.use_ollama:
+    def stream_response(self, user_id, user_message, session_id=None):
+        """Yield the assistant reply in chunks as the provider produces them
+        
+        Whatever text was produced is saved when the stream ends, including when
+        the provider fails midway or the client disconnects; on failure before
+        any text arrived the fallback message is yielded instead.
+        """
+        asked_at = datetime.utcnow()
+        if self.ready.is_set() and not self.model and not self.use_ollama:
             self.initialize()
         
-        prompt = f"""Analyze this workout pose data and provide brief, actionable feedback:
-
-Exercise: {exercise_name}
-Form Score: {pose_data.get('form_score', 0)}/100
-Rep Count: {pose_data.get('rep_count', 0)}
-Range of Motion: {pose_data.get('range_of_motion', 0)}
-
-Provide:
-1. One sentence on form quality
-2. One specific improvement tip (if score < 80)
-3. Encouragement
-
-Keep response under 100 words."""
+        # A cached chat would not know about this streamed turn
+        with self._chat_sessions_lock:
+            self._chat_sessions.pop((user_id, session_id or 'default'), None)
+        
+        context = self.get_user_context(user_id, session_id, user_message)
+        full_prompt = f"{COACH_SYSTEM_PROMPT}\n\n{context}\n\nUser: {user_message}\n\nAssistant:"
+        chunks = []
+        model_used = current_app.config['OLLAMA_MODEL' if self.use_ollama else 'GEMINI_MODEL']
         
         try:
             if self.use_ollama:
-                response = self.ollama_client.chat(
-                    model=current_app.config['OLLAMA_MODEL'],
-                    messages=[{'role': 'user', 'content': prompt}]
+                stream = self.ollama_client.chat(
+                    model=model_used,
+                    messages=[
+                        {'role': 'system', 'content': COACH_SYSTEM_PROMPT},
+                        {'role': 'user', 'content': f"{context}\n\n{user_message}"}
+                    ],
+                    stream=True
                 )
-                feedback = response['message']['content']
+                for part in stream:
+                    text = part['message']['content']
+                    if text:
+                        chunks.append(text)
+                        yield text
             else:
-                response = self.model.generate_content(prompt)
-                feedback = response.text
-            
-            return feedback
+                for part in self.model.generate_content(full_prompt, stream=True):
+                    text = part.text
+                    if text:
+                        chunks.append(text)
+                        yield text
+        except Exception as e:
+            current_app.logger.error("Error streaming LLM response: %s", e)
+            if not chunks:
+                yield FALLBACK_CHAT_MESSAGE
+        finally:
+            if chunks:
+                self._save_streamed_exchange(
+                    user_id, session_id, user_message, ''.join(chunks), full_prompt, model_used, asked_at
+                )
+    
+    def _save_streamed_exchange(self, user_id, session_id, user_message, assistant_message, full_prompt, model_used,
+                                asked_at):
+        """Queue a streamed exchange for saving (runs from the generator's cleanup)"""
+        if self.use_ollama:
+            tokens_used = 0  # Ollama doesn't track tokens
+        else:
+            tokens_used = len(full_prompt.split()) + len(assistant_message.split())
+        
+        self._save_conversation_pair(
+            user_id, session_id, user_message, assistant_message, tokens_used, model_used, asked_at
+        )
+    
+    def _take_chat_session(self, user_id, session_id):
+        """(chat, seen_id, pending): the cached Gemini chat for this conversation,
+        or a new one seeded with the user's full context, the newest message id it
+        has seen and the writer Futures of its turns not yet saved
+        
+        The chat is removed from the cache while in use, so concurrent requests on
+        the same conversation never share a ChatSession. A cached chat is only
+        reused if every row added to the conversation since `seen_id` is one of
+        its own turns; otherwise another worker has answered in between and the
+        chat is rebuilt.
+        """
+        session_id = session_id or 'default'
+        with self._chat_sessions_lock:
+            cached = self._chat_sessions.pop((user_id, session_id), None)
+        in_session = (LLMConversation.user_id == user_id) & (LLMConversation.session_id == session_id)
+        
+        if cached is not None:
+            chat, seen_id, pending = cached
+            own_ids = set()
+            for written in pending:
+                if written.done():
+                    own_ids.update(written.result())
+            newer = db.session.scalars(
+                select(LLMConversation.id)
+                .where(in_session, LLMConversation.id > seen_id)
+                .limit(len(own_ids) + 1)
+            ).all()
+            if own_ids.issuperset(newer):
+                pending = [written for written in pending if not written.done()]
+                return chat, max(newer, default=seen_id), pending
+        
+        # The seed outlives this turn, so it carries the full context rather than
+        # only the sections this message asks about
+        seen_id = db.session.scalar(select(func.max(LLMConversation.id)).where(in_session)) or 0
+        context = self.get_user_context(user_id, session_id)
+        return self.model.start_chat(history=[
+            {'role': 'user', 'parts': [f"{COACH_SYSTEM_PROMPT}\n\n{context}"]},
+            {'role': 'model', 'parts': ["Understood."]}
+        ]), seen_id, []
+    
+    def _return_chat_session(self, user_id, session_id, chat, seen_id, pending):
+        """Put a chat back in the cache, keeping the seed turn and the latest messages"""
+        keep = current_app.config['MAX_CONVERSATION_HISTORY'] // 2 * 2  # whole user/model pairs
+        history = chat.history
+        if len(history) > 2 + keep:
+            chat.history = history[:2] + history[len(history) - keep:]
+        with self._chat_sessions_lock:
+            self._chat_sessions[(user_id, session_id or 'default')] = (chat, seen_id, pending)
+    
+    def analyze_pose_feedback(self, user_id, pose_data, exercise_name):
+        """Generate feedback based on pose detection results"""
+        cache_key = pose_feedback_cache_key(exercise_name, pose_data)
+        if cache_key is not None:
+            feedback = cache_get(cache_key)
+            if feedback is not None:
+                return feedback
+        
+        if self.ready.is_set() and not self.model and not self.use_ollama:
+            self.initialize()
+        
+        try:
+            feedback = self._coalesce_pose_feedback(user_id, pose_data, exercise_name)
         
         except Exception as e:
             current_app.logger.error(f"Error generating pose feedback: {e}")
@@ -212,6 +609,83 @@ Keep response under 100 words."""
                 return "Great form! Keep maintaining this quality throughout your workout."
             else:
                 return "Good effort! Focus on controlled movements and full range of motion."
+        
+        # Fallback messages are never cached, only real model output
+        if cache_key is not None:
+            cache_set(cache_key, feedback, current_app.config['POSE_FEEDBACK_CACHE_TTL'])
+        return feedback
+    
+    def _coalesce_pose_feedback(self, user_id, pose_data, exercise_name):
+        """Feedback for one pose result, batched with the user's other results in the same window
+        
+        The first caller for a user sends everything queued for that user as one
+        prompt and hands each caller its own answer. It only waits
+        POSE_FEEDBACK_BATCH_WINDOW seconds for more results while another request
+        for the user is already in flight; a lone result is sent right away.
+        """
+        future = Future()
+        with self._pose_batches_lock:
+            in_flight = self._pose_in_flight[user_id] = self._pose_in_flight.get(user_id, 0) + 1
+            batch = self._pose_batches.get(user_id)
+            is_leader = batch is None
+            if is_leader:
+                batch = self._pose_batches[user_id] = []
+            batch.append((pose_data, exercise_name, future))
+        
+        try:
+            if is_leader:
+                if in_flight > 1:
+                    time.sleep(current_app.config['POSE_FEEDBACK_BATCH_WINDOW'])
+                with self._pose_batches_lock:
+                    batch = self._pose_batches.pop(user_id)
+                try:
+                    results = self._pose_feedback_batch([(pose, name) for pose, name, _ in batch])
+                except BaseException as e:
+                    results = [e] * len(batch)
+                for (_, _, waiter), result in zip(batch, results):
+                    if isinstance(result, BaseException):
+                        waiter.set_exception(result)
+                    else:
+                        waiter.set_result(result)
+            
+            return future.result()
+        finally:
+            with self._pose_batches_lock:
+                if self._pose_in_flight[user_id] == 1:
+                    del self._pose_in_flight[user_id]
+                else:
+                    self._pose_in_flight[user_id] -= 1
+    
+    def _pose_feedback_batch(self, items):
+        """Feedback per (pose_data, exercise_name), or the exception for items that failed"""
+        if len(items) == 1:
+            return [self._generate_text(_pose_feedback_prompt(*items[0]))]
+        
+        results = "\n".join(
+            f"{i}. Exercise: {name}, Form Score: {pose.get('form_score', 0)}/100, "
+            f"Rep Count: {pose.get('rep_count', 0)}, Range of Motion: {pose.get('range_of_motion', 0)}"
+            for i, (pose, name) in enumerate(items, 1)
+        )
+        prompt = f"""Analyze these workout pose results and provide brief, actionable feedback for each:
+
+{results}
+
+For each result provide one sentence on form quality, one specific improvement tip (if score < 80) and encouragement, under 100 words.
+
+Reply with only a JSON array of {len(items)} strings, one per result, in the same order."""
+        
+        text = self._generate_text(prompt)
+        try:
+            feedback = orjson.loads(text[text.index('['):text.rindex(']') + 1])
+        except ValueError:
+            feedback = None
+        if (isinstance(feedback, list) and len(feedback) == len(items)
+                and all(isinstance(item, str) for item in feedback)):
+            return feedback
+        
+        # Unusable batch reply: ask for each result separately (still concurrently)
+        current_app.logger.warning("Batched pose feedback reply could not be parsed, retrying per item")
+        return self.generate_texts([_pose_feedback_prompt(pose, name) for pose, name in items])
     
     def generate_motivation(self, user_id):
         """Generate daily motivation based on user's progress"""
@@ -232,35 +706,95 @@ Keep response under 100 words."""
 Be encouraging and specific to their progress."""
         
         try:
-            if self.use_ollama:
-                response = self.ollama_client.chat(
-                    model=current_app.config['OLLAMA_MODEL'],
-                    messages=[{'role': 'user', 'content': prompt}]
-                )
-                message = response['message']['content']
-            else:
-                response = self.model.generate_content(prompt)
-                message = response.text
-            
-            return message
+            return self._generate_text(prompt)
         
         except Exception as e:
             current_app.logger.error(f"Error generating motivation: {e}")
             return f"Great job on {sessions_this_week} workouts this week! Keep up the momentum!"
     
-    def _save_conversation(self, user_id, session_id, role, content, tokens, model):
-        """Save conversation message to database"""
-        conversation = LLMConversation(
-            user_id=user_id,
-            session_id=session_id or 'default',
-            role=role,
-            content=content,
-            tokens_used=tokens,
-            model=model
+    def generate_texts(self, prompts):
+        """Run independent single-turn prompts concurrently, results in prompt order
+        
+        A prompt that fails yields its exception in place of the text.
+        """
+        if self.ready.is_set() and not self.model and not self.use_ollama:
+            self.initialize()
+        
+        ollama_model = current_app.config['OLLAMA_MODEL']
+        
+        async def gather():
+            return await asyncio.gather(
+                *(self._agenerate_text(prompt, ollama_model) for prompt in prompts),
+                return_exceptions=True
+            )
+        
+        return asyncio.run_coroutine_threadsafe(gather(), self._event_loop()).result()
+    
+    def _generate_text(self, prompt):
+        """Blocking wrapper around a single async completion"""
+        result = self.generate_texts([prompt])[0]
+        if isinstance(result, BaseException):
+            raise result
+        return result
+    
+    async def _agenerate_text(self, prompt, ollama_model):
+        """Single-turn completion that yields the loop while waiting on the provider"""
+        if self.use_ollama:
+            response = await self.ollama_async.chat(
+                model=ollama_model,
+                messages=[{'role': 'user', 'content': prompt}]
+            )
+            return response['message']['content']
+        response = await self.model.generate_content_async(prompt)
+        return response.text
+    
+    def _event_loop(self):
+        """Background event loop shared by all async provider calls"""
+        if self._loop is None:
+            with self._loop_lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name='llm-async', daemon=True).start()
+                    self._loop = loop
+        return self._loop
+    
+    def _save_conversation_pair(self, user_id, session_id, user_message, assistant_message, tokens, model, asked_at):
+        """Queue both sides of an exchange for the background writer
+        
+        Tokens are split evenly between the two rows; they are inserted (and
+        mirrored to the Redis history) shortly after, off the response path.
+        Returns the writer's Future for the two row ids.
+        """
+        return conversation_writer.enqueue(
+            user_id, session_id, user_message, assistant_message, tokens, model, asked_at
         )
-        db.session.add(conversation)
-        db.session.commit()
 
 
 # Global instance
 llm_service = LLMService()
+
+
+def _context_rows_changed(mapper, connection, target):
+    user_id = target.id if isinstance(target, User) else target.user_id
+    llm_service._forget_user_context(user_id)
+    # Invalidate everywhere once committed, in case a concurrent request cached
+    # the pre-commit rows in between
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('stale_context_users', set()).add(user_id)
+
+
+def _drop_stale_contexts(session):
+    for user_id in session.info.pop('stale_context_users', ()):
+        llm_service.invalidate_user_context(user_id)
+
+
+def _forget_stale_contexts(session):
+    session.info.pop('stale_context_users', None)
+
+
+for _model in (User, WorkoutSession, Habit):
+    for _event in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_model, _event, _context_rows_changed)
+event.listen(Session, 'after_commit', _drop_stale_contexts)
+event.listen(Session, 'after_rollback', _forget_stale_contexts)
@@ -9,6 +9,25 @@ from .validators import (
     validate_workout_session,
     validate_habit
 )
+from .jwt_cache import CachedJWTManager
+from .json_provider import OrjsonProvider
+from .redis_cache import (
+    get_redis,
+    cache_get,
+    cache_set,
+    cache_delete,
+    cache_counter,
+    cache_incr,
+    cache_list_range,
+    cache_list_version,
+    cache_list_fill,
+    cache_list_push
+)
+from .background import run_in_background
+from .request_json import get_json_body
+from .upload_request import UploadRequest
+from .pagination import get_page_cursor, before_cursor, next_page_cursor
+from .auth_utils import get_current_user_id
 
 __all__ = [
     'Validator',
@@ -17,5 +36,24 @@ __all__ = [
     'validate_user_profile_update',
     'validate_workout_routine',
     'validate_workout_session',
-    'validate_habit'
+    'validate_habit',
+    'CachedJWTManager',
+    'OrjsonProvider',
+    'get_redis',
+    'cache_get',
+    'cache_set',
+    'cache_delete',
+    'cache_counter',
+    'cache_incr',
+    'cache_list_range',
+    'cache_list_version',
+    'cache_list_fill',
+    'cache_list_push',
+    'run_in_background',
+    'get_json_body',
+    'UploadRequest',
+    'get_page_cursor',
+    'before_cursor',
+    'next_page_cursor',
+    'get_current_user_id'
 ]
@@ -0,0 +1,13 @@
+"""Authentication helpers for route handlers"""
+
+from flask import g
+from flask_jwt_extended import get_jwt_identity
+
+
+def get_current_user_id():
+    """The authenticated user's id as an int, parsed once per request"""
+    user_id = g.get('_current_user_id')
+    if user_id is None:
+        user_id = int(get_jwt_identity())
+        g._current_user_id = user_id
+    return user_id
@@ -0,0 +1,29 @@
+"""Fire-and-forget work that runs after the response is sent"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='background')
+
+
+def run_in_background(fn, *args, **kwargs):
+    """Run `fn` on the shared background pool inside the current app's context
+
+    The task gets its own scoped DB session, committed when `fn` returns
+    (like a request's) and removed when it finishes. Exceptions roll it back
+    and are logged rather than propagated.
+    """
+    app = current_app._get_current_object()
+    db = app.extensions['sqlalchemy']  # app.utils is imported before app.db exists
+
+    def task():
+        with app.app_context():
+            try:
+                fn(*args, **kwargs)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                app.logger.exception("Background task %s failed", getattr(fn, '__name__', fn))
+
+    return _executor.submit(task)
@@ -0,0 +1,30 @@
+"""orjson-backed JSON provider for Flask"""
+
+import orjson
+from flask.json.provider import DefaultJSONProvider
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Serialize responses with orjson
+
+    Naive datetimes (all of ours are UTC) are emitted natively as ISO 8601
+    with a trailing `Z`, so models can hand datetime objects straight through.
+    Non-string dict keys (e.g. ids or weekdays) are stringified like `json` does.
+    """
+
+    option = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self.option).decode()
+
+    def response(self, *args, **kwargs):
+        """jsonify() straight to bytes, skipping the str round trip"""
+        obj = self._prepare_response_obj(args, kwargs)
+        option = self.option
+        if self.compact is False or (self.compact is None and self._app.debug):
+            option |= orjson.OPT_INDENT_2
+        body = orjson.dumps(obj, default=self.default, option=option) + b'\n'
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
@@ -0,0 +1,51 @@
+"""JWT manager with a bounded cache of verified tokens"""
+
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from flask_jwt_extended import JWTManager
+
+
+class CachedJWTManager(JWTManager):
+    """JWTManager that skips signature verification for recently seen tokens
+
+    Decoded claims are kept in an LRU keyed by the raw encoded token and are
+    only served while the token's `exp` is still in the future.
+    """
+
+    def __init__(self, app=None, add_context_processor=False):
+        self._token_cache = OrderedDict()
+        self._token_cache_lock = Lock()
+        self._token_cache_size = 8192
+        super().__init__(app, add_context_processor)
+
+    def init_app(self, app, add_context_processor=False):
+        super().init_app(app, add_context_processor)
+        self._token_cache_size = app.config.get('JWT_DECODE_CACHE_SIZE', 8192)
+
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        # CSRF checks and expired-token decoding always take the full path
+        if csrf_value is not None or allow_expired or not self._token_cache_size:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        now = time.time()
+        with self._token_cache_lock:
+            entry = self._token_cache.get(encoded_token)
+            if entry is not None:
+                claims, exp = entry
+                if exp > now:
+                    self._token_cache.move_to_end(encoded_token)
+                    return claims
+                del self._token_cache[encoded_token]
+
+        claims = super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        exp = claims.get('exp')
+        if exp is not None:
+            with self._token_cache_lock:
+                self._token_cache[encoded_token] = (claims, exp)
+                if len(self._token_cache) > self._token_cache_size:
+                    self._token_cache.popitem(last=False)
+
+        return claims
@@ -0,0 +1,51 @@
+"""Keyset pagination cursors for list endpoints"""
+
+import math
+from collections.abc import Mapping
+from datetime import datetime, timezone
+
+from flask import request
+from sqlalchemy import tuple_
+
+
+def get_page_cursor():
+    """Parse `before_ts` (epoch seconds) and `before_id` from the query string
+
+    Returns (cursor, error): cursor is None for the first page, otherwise a
+    (naive UTC datetime, id or None) pair; error is a message for a 400.
+    """
+    before_ts = request.args.get('before_ts', type=float)
+    if before_ts is None:
+        return None, None
+    if not math.isfinite(before_ts):
+        return None, 'before_ts must be a finite number'
+    try:
+        before = datetime.fromtimestamp(before_ts, timezone.utc).replace(tzinfo=None)
+    except (OverflowError, OSError, ValueError):
+        return None, 'before_ts is out of range'
+    return (before, request.args.get('before_id', type=int)), None
+
+
+def before_cursor(ts_column, id_column, cursor):
+    """Filter for rows strictly older than the cursor in (ts desc, id desc) order
+
+    Rows sharing the boundary timestamp are told apart by id; a cursor without
+    an id (older clients) falls back to the timestamp alone.
+    """
+    before, before_id = cursor
+    if before_id is None:
+        return ts_column < before
+    return tuple_(ts_column, id_column) < tuple_(before, before_id)
+
+
+def next_page_cursor(items, limit, ts_key, id_key='id'):
+    """`next_before_ts`/`next_before_id` for a full page, or Nones on the last page"""
+    if len(items) < limit:
+        return {'next_before_ts': None, 'next_before_id': None}
+    last = items[-1]
+    ts = last[ts_key] if isinstance(last, Mapping) else getattr(last, ts_key)
+    last_id = last[id_key] if isinstance(last, Mapping) else getattr(last, id_key)
+    return {
+        'next_before_ts': ts.replace(tzinfo=timezone.utc).timestamp(),
+        'next_before_id': last_id
+    }
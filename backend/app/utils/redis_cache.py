@@ -0,0 +1,159 @@
+"""Best-effort Redis cache helpers
+
+Every helper degrades to a cache miss / no-op when REDIS_URL is unset or
+Redis is unreachable, so callers can always fall back to recomputing.
+"""
+
+from threading import Lock
+
+import redis
+from flask import current_app
+
+_clients = {}
+_clients_lock = Lock()
+
+
+def get_redis():
+    """Shared client for the app's REDIS_URL, or None if Redis is not configured"""
+    url = current_app.config.get('REDIS_URL')
+    if not url:
+        return None
+
+    client = _clients.get(url)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(url)
+            if client is None:
+                timeout = current_app.config.get('REDIS_SOCKET_TIMEOUT', 0.25)
+                client = redis.Redis.from_url(
+                    url,
+                    decode_responses=True,
+                    socket_timeout=timeout,
+                    socket_connect_timeout=timeout
+                )
+                _clients[url] = client
+    return client
+
+
+def cache_get(key):
+    """Cached string for `key`, or None on a miss or Redis error"""
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        return client.get(key)
+    except redis.RedisError as e:
+        current_app.logger.warning("Redis GET %s failed: %s", key, e)
+        return None
+
+
+def cache_set(key, value, ttl):
+    """Store `value` under `key` for `ttl` seconds (errors are logged and ignored)"""
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        client.setex(key, ttl, value)
+    except redis.RedisError as e:
+        current_app.logger.warning("Redis SETEX %s failed: %s", key, e)
+
+
+def cache_delete(*keys):
+    """Drop cached keys (errors are logged and ignored)"""
+    client = get_redis()
+    if client is None or not keys:
+        return
+    try:
+        client.delete(*keys)
+    except redis.RedisError as e:
+        current_app.logger.warning("Redis DEL %s failed: %s", keys, e)
+
+
+def cache_counter(key):
+    """Integer counter at `key` (0 if unset), or None if Redis is unavailable"""
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        return int(client.get(key) or 0)
+    except redis.RedisError as e:
+        current_app.logger.warning("Redis GET %s failed: %s", key, e)
+        return None
+
+
+def cache_incr(key, ttl):
+    """Increment the counter at `key` and refresh its TTL (errors are logged and ignored)"""
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        client.pipeline().incr(key).expire(key, ttl).execute()
+    except redis.RedisError as e:
+        current_app.logger.warning("Redis INCR %s failed: %s", key, e)
+
+
+def cache_list_range(key, start, stop):
+    """Items of the list at `key` (LRANGE), or None on a miss or Redis error"""
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        return client.lrange(key, start, stop) or None
+    except redis.RedisError as e:
+        current_app.logger.warning("Redis LRANGE %s failed: %s", key, e)
+        return None
+
+
+def _list_version_key(key):
+    return f"{key}:version"
+
+
+def cache_list_version(key):
+    """Write counter of the list at `key`, read before loading the rows for
+    cache_list_fill(), or None if Redis is unavailable"""
+    return cache_counter(_list_version_key(key))
+
+
+def cache_list_fill(key, values, ttl, version):
+    """Replace the list at `key` with `values`, head first, unless a push has
+    happened since `version` was read (errors are logged and ignored)
+
+    A push that lands between reading the rows and filling would otherwise find
+    the list missing, do nothing, and leave its items out of the filled list.
+    """
+    client = get_redis()
+    if client is None or not values or version is None:
+        return
+    version_key = _list_version_key(key)
+    try:
+        with client.pipeline() as pipe:
+            pipe.watch(version_key)
+            if int(pipe.get(version_key) or 0) != version:
+                return
+            pipe.multi()
+            pipe.delete(key).rpush(key, *values).expire(key, ttl)
+            pipe.execute()
+    except redis.WatchError:
+        pass  # Pushed meanwhile; the next read fills it
+    except redis.RedisError as e:
+        current_app.logger.warning("Redis list fill %s failed: %s", key, e)
+
+
+def cache_list_push(key, values, max_len, ttl):
+    """Prepend `values` to the list at `key` if it exists, keeping the first `max_len` items
+
+    A missing list stays missing (LPUSHX), so a partial list is never started;
+    the next read fills it from the database instead. The list's write counter
+    is bumped either way, so a fill racing with this push is dropped.
+    """
+    client = get_redis()
+    if client is None or not values:
+        return
+    version_key = _list_version_key(key)
+    try:
+        client.pipeline()\
+            .incr(version_key).expire(version_key, ttl)\
+            .lpushx(key, *values).ltrim(key, 0, max_len - 1).expire(key, ttl)\
+            .execute()
+    except redis.RedisError as e:
+        current_app.logger.warning("Redis list push %s failed: %s", key, e)
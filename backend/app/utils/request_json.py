@@ -0,0 +1,21 @@
+"""Request body parsing"""
+
+import orjson
+from flask import request
+
+
+def get_json_body():
+    """Parse the raw request body with orjson (None unless it is a JSON object)
+
+    Skips Flask's mimetype check and JSON provider indirection; empty bodies,
+    malformed JSON and non-object payloads all come back as None so handlers
+    can keep their `if not data` 400 branches.
+    """
+    body = request.get_data(cache=False)
+    if not body:
+        return None
+    try:
+        data = orjson.loads(body)
+    except orjson.JSONDecodeError:
+        return None
+    return data if isinstance(data, dict) else None
@@ -0,0 +1,25 @@
+"""Request class that keeps multipart uploads off the heap"""
+
+from tempfile import SpooledTemporaryFile
+
+from flask import Request, current_app
+
+
+class UploadRequest(Request):
+    """Flask request with bounded in-memory form parsing
+
+    Non-file form fields are capped at MAX_FORM_MEMORY_SIZE, and uploaded
+    files spill to UPLOAD_FOLDER once they pass the same size instead of
+    Werkzeug's 500 KB default in the system temp dir (often tmpfs).
+    """
+
+    @property
+    def max_form_memory_size(self):
+        return current_app.config['MAX_FORM_MEMORY_SIZE']
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SpooledTemporaryFile(
+            max_size=current_app.config['MAX_FORM_MEMORY_SIZE'],
+            mode='rb+',
+            dir=current_app.config['UPLOAD_FOLDER']
+        )
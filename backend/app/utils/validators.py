@@ -3,6 +3,13 @@
 import re
 from datetime import datetime
 
+# google-re2 (optional) matches in linear time with no backtracking; it has the
+# same compile/match API but no lookaheads, so only the plain patterns use it
+try:
+    import re2 as _linear_re
+except ImportError:
+    _linear_re = re
+
 
 class ValidationError(Exception):
     """Custom validation error"""
@@ -16,32 +23,43 @@ class Validator:
     """Input validation helper class"""
     
     # Email regex (RFC 5322 simplified)
-    EMAIL_REGEX = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+    EMAIL_REGEX = _linear_re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+    
+    # Only alphanumeric and underscore
+    USERNAME_REGEX = _linear_re.compile(r'^[a-zA-Z0-9_]+$')
+    
+    # At least one uppercase letter, one lowercase letter and one digit
+    PASSWORD_COMPLEXITY_REGEX = re.compile(r'^(?=.*[A-Z])(?=.*[a-z])(?=.*[0-9])', re.DOTALL)
     
-    # Allowed values for enum fields
-    FITNESS_LEVELS = ['beginner', 'intermediate', 'advanced']
-    WORKOUT_DIFFICULTIES = ['easy', 'medium', 'hard']
-    SESSION_TYPES = ['camera', 'manual']
-    HABIT_FREQUENCIES = ['daily', 'weekly', 'custom']
+    # Allowed values for enum fields (tuples keep error messages in a stable order)
+    FITNESS_LEVELS = ('beginner', 'intermediate', 'advanced')
+    WORKOUT_DIFFICULTIES = ('easy', 'medium', 'hard')
+    SESSION_TYPES = ('camera', 'manual')
+    HABIT_FREQUENCIES = ('daily', 'weekly', 'custom')
+    
+    # str.translate table deleting control characters except newline, carriage return and tab
+    CONTROL_CHARS_TABLE = dict.fromkeys(i for i in range(32) if chr(i) not in '\n\r\t')
     
     @staticmethod
     def validate_email(email):
         """Validate email format"""
+        # Valid addresses take one strip, one length check and one match; the
+        # individual checks below only run to pick the error message
+        if isinstance(email, str):
+            stripped = email.strip()
+            if len(stripped) <= 120 and Validator.EMAIL_REGEX.match(stripped):
+                return stripped.lower()  # Normalize to lowercase
+        
         if not email:
             raise ValidationError("Email is required", "email")
         
         if not isinstance(email, str):
             raise ValidationError("Email must be a string", "email")
         
-        email = email.strip()
-        
-        if len(email) > 120:
+        if len(stripped) > 120:
             raise ValidationError("Email too long (max 120 characters)", "email")
         
-        if not Validator.EMAIL_REGEX.match(email):
-            raise ValidationError("Invalid email format", "email")
-        
-        return email.lower()  # Normalize to lowercase
+        raise ValidationError("Invalid email format", "email")
     
     @staticmethod
     def validate_password(password, min_length=8, max_length=128):
@@ -59,11 +77,7 @@ class Validator:
             raise ValidationError(f"Password too long (max {max_length} characters)", "password")
         
         # Check complexity
-        has_upper = any(c.isupper() for c in password)
-        has_lower = any(c.islower() for c in password)
-        has_digit = any(c.isdigit() for c in password)
-        
-        if not (has_upper and has_lower and has_digit):
+        if not Validator.PASSWORD_COMPLEXITY_REGEX.match(password):
             raise ValidationError(
                 "Password must contain uppercase, lowercase, and digit",
                 "password"
@@ -88,8 +102,7 @@ class Validator:
         if len(username) > max_length:
             raise ValidationError(f"Username too long (max {max_length} characters)", "username")
         
-        # Only alphanumeric and underscore
-        if not re.match(r'^[a-zA-Z0-9_]+$', username):
+        if not Validator.USERNAME_REGEX.match(username):
             raise ValidationError("Username can only contain letters, numbers, and underscores", "username")
         
         return username
@@ -212,107 +225,80 @@ class Validator:
         if not isinstance(text, str):
             return ""
         
-        # Remove null bytes and other control characters
-        text = ''.join(char for char in text if ord(char) >= 32 or char in '\n\r\t')
-        
-        # Truncate if too long
-        if len(text) > max_length:
-            text = text[:max_length]
-        
-        return text.strip()
+        # Remove null bytes and other control characters, then truncate (slicing
+        # first would let removed characters shorten the result below max_length)
+        return text.translate(Validator.CONTROL_CHARS_TABLE)[:max_length].strip()
 
 
-def validate_user_registration(data):
-    """Validate user registration data"""
-    errors = {}
-    validated = {}
-    
-    try:
-        validated['email'] = Validator.validate_email(data.get('email'))
-    except ValidationError as e:
-        errors[e.field] = e.message
-    
-    try:
-        validated['password'] = Validator.validate_password(data.get('password'))
-    except ValidationError as e:
-        errors[e.field] = e.message
-    
-    try:
-        validated['username'] = Validator.validate_username(data.get('username'))
-    except ValidationError as e:
-        errors[e.field] = e.message
-    
-    try:
-        validated['name'] = Validator.validate_string(
-            data.get('name'), 'name', max_length=120, required=False
-        )
-    except ValidationError as e:
-        errors[e.field] = e.message
-    
-    try:
-        validated['fitness_level'] = Validator.validate_enum(
-            data.get('fitness_level', 'beginner'),
-            'fitness_level',
-            Validator.FITNESS_LEVELS,
-            required=False
-        )
-    except ValidationError as e:
-        errors[e.field] = e.message
-    
-    if errors:
-        return None, errors
-    
-    return validated, None
+# Field specs: (field, validator, kwargs, always). A field is validated when it
+# is present in the payload, or always on create when `always` is set; on update
+# only present fields are checked so omitted ones are left untouched.
+_REGISTRATION_FIELDS = (
+    ('email', Validator.validate_email, {}, True),
+    ('password', Validator.validate_password, {}, True),
+    ('username', Validator.validate_username, {}, True),
+    ('name', Validator.validate_string, {'field_name': 'name', 'max_length': 120, 'required': False}, True),
+    ('fitness_level', Validator.validate_enum,
+     {'field_name': 'fitness_level', 'allowed_values': Validator.FITNESS_LEVELS, 'required': False}, True),
+)
 
+_PROFILE_FIELDS = (
+    ('name', Validator.validate_string, {'field_name': 'name', 'max_length': 120, 'required': False}, False),
+    ('height_cm', Validator.validate_number,
+     {'field_name': 'height_cm', 'min_val': 50, 'max_val': 300, 'required': False}, False),  # Realistic human height range
+    ('weight_kg', Validator.validate_number,
+     {'field_name': 'weight_kg', 'min_val': 20, 'max_val': 500, 'required': False}, False),  # Realistic weight range
+    ('fitness_level', Validator.validate_enum,
+     {'field_name': 'fitness_level', 'allowed_values': Validator.FITNESS_LEVELS, 'required': False}, False),
+    ('goals', Validator.validate_json, {'field_name': 'goals', 'required': False}, False),
+)
 
-def validate_user_profile_update(data):
-    """Validate user profile update data"""
+# A name sent on update must still be a non-empty string: the column is NOT NULL
+_ROUTINE_FIELDS = (
+    ('name', Validator.validate_string, {'field_name': 'name', 'max_length': 120}, True),
+    ('description', Validator.sanitize_text, {'max_length': 2000}, False),
+    ('exercises', Validator.validate_json, {'field_name': 'exercises', 'required': False}, False),
+    ('difficulty', Validator.validate_enum,
+     {'field_name': 'difficulty', 'allowed_values': Validator.WORKOUT_DIFFICULTIES, 'required': False}, False),
+    ('estimated_duration_minutes', Validator.validate_number,
+     {'field_name': 'estimated_duration_minutes', 'min_val': 1, 'max_val': 600,  # 1 min to 10 hours
+      'required': False, 'allow_float': False}, False),
+    ('is_camera_based', Validator.validate_boolean, {'field_name': 'is_camera_based', 'required': False}, False),
+)
+
+_SESSION_FIELDS = (
+    ('session_type', Validator.validate_enum,
+     {'field_name': 'session_type', 'allowed_values': Validator.SESSION_TYPES}, False),
+    ('started_at', Validator.validate_datetime_iso, {'field_name': 'started_at', 'required': False}, False),
+    ('completed_at', Validator.validate_datetime_iso, {'field_name': 'completed_at', 'required': False}, False),
+    ('duration_minutes', Validator.validate_number,
+     {'field_name': 'duration_minutes', 'min_val': 1, 'max_val': 600, 'required': False, 'allow_float': False}, False),
+    ('calories_burned', Validator.validate_number,
+     {'field_name': 'calories_burned', 'min_val': 0, 'max_val': 10000, 'required': False, 'allow_float': False}, False),
+    ('exercises_completed', Validator.validate_json,
+     {'field_name': 'exercises_completed', 'required': False}, False),
+    ('notes', Validator.sanitize_text, {'max_length': 2000}, False),
+)
+
+_HABIT_FIELDS = (
+    ('name', Validator.validate_string, {'field_name': 'name', 'max_length': 120}, True),
+    ('frequency', Validator.validate_enum,
+     {'field_name': 'frequency', 'allowed_values': Validator.HABIT_FREQUENCIES, 'required': False}, False),
+    ('schedule', Validator.validate_json, {'field_name': 'schedule', 'required': False}, False),
+    ('is_active', Validator.validate_boolean, {'field_name': 'is_active', 'required': False}, False),
+)
+
+
+def _validate_fields(data, specs, is_update=False):
+    """Run field specs over a payload, returning (validated, None) or (None, errors)"""
     errors = {}
     validated = {}
     
-    if 'name' in data:
+    for field, validate, kwargs, always in specs:
+        if field not in data and (is_update or not always):
+            continue
         try:
-            validated['name'] = Validator.validate_string(
-                data.get('name'), 'name', max_length=120, required=False
-            )
-        except ValidationError as e:
-            errors[e.field] = e.message
-    
-    if 'height_cm' in data:
-        try:
-            validated['height_cm'] = Validator.validate_number(
-                data.get('height_cm'), 'height_cm',
-                min_val=50, max_val=300,  # Realistic human height range
-                required=False
-            )
-        except ValidationError as e:
-            errors[e.field] = e.message
-    
-    if 'weight_kg' in data:
-        try:
-            validated['weight_kg'] = Validator.validate_number(
-                data.get('weight_kg'), 'weight_kg',
-                min_val=20, max_val=500,  # Realistic weight range
-                required=False
-            )
-        except ValidationError as e:
-            errors[e.field] = e.message
-    
-    if 'fitness_level' in data:
-        try:
-            validated['fitness_level'] = Validator.validate_enum(
-                data.get('fitness_level'), 'fitness_level',
-                Validator.FITNESS_LEVELS,
-                required=False
-            )
-        except ValidationError as e:
-            errors[e.field] = e.message
-    
-    if 'goals' in data:
-        try:
-            validated['goals'] = Validator.validate_json(
-                data.get('goals'), 'goals', required=False
-            )
+            validated[field] = validate(data.get(field), **kwargs)
         except ValidationError as e:
             errors[e.field] = e.message
     
@@ -322,181 +308,26 @@ def validate_user_profile_update(data):
     return validated, None
 
 
+def validate_user_registration(data):
+    """Validate user registration data"""
+    return _validate_fields({'fitness_level': 'beginner', **data}, _REGISTRATION_FIELDS)
+
+
+def validate_user_profile_update(data):
+    """Validate user profile update data"""
+    return _validate_fields(data, _PROFILE_FIELDS, is_update=True)
+
+
 def validate_workout_routine(data, is_update=False):
     """Validate workout routine data"""
-    errors = {}
-    validated = {}
-    
-    try:
-        validated['name'] = Validator.validate_string(
-            data.get('name'), 'name', max_length=120, required=not is_update
-        )
-    except ValidationError as e:
-        errors[e.field] = e.message
-    
-    if 'description' in data:
-        try:
-            validated['description'] = Validator.sanitize_text(
-                data.get('description'), max_length=2000
-            )
-        except ValidationError as e:
-            errors[e.field] = e.message
-    
-    if 'exercises' in data:
-        try:
-            validated['exercises'] = Validator.validate_json(
-                data.get('exercises'), 'exercises', required=False
-            )
-        except ValidationError as e:
-            errors[e.field] = e.message
-    
-    if 'difficulty' in data:
-        try:
-            validated['difficulty'] = Validator.validate_enum(
-                data.get('difficulty'), 'difficulty',
-                Validator.WORKOUT_DIFFICULTIES,
-                required=False
-            )
-        except ValidationError as e:
-            errors[e.field] = e.message
-    
-    if 'estimated_duration_minutes' in data:
-        try:
-            validated['estimated_duration_minutes'] = Validator.validate_number(
-                data.get('estimated_duration_minutes'),
-                'estimated_duration_minutes',
-                min_val=1, max_val=600,  # 1 min to 10 hours
-                required=False,
-                allow_float=False
-            )
-        except ValidationError as e:
-            errors[e.field] = e.message
-    
-    if 'is_camera_based' in data:
-        try:
-            validated['is_camera_based'] = Validator.validate_boolean(
-                data.get('is_camera_based'), 'is_camera_based', required=False
-            )
-        except ValidationError as e:
-            errors[e.field] = e.message
-    
-    if errors:
-        return None, errors
-    
-    return validated, None
+    return _validate_fields(data, _ROUTINE_FIELDS, is_update)
 
 
 def validate_workout_session(data, is_update=False):
     """Validate workout session data"""
-    errors = {}
-    validated = {}
-    
-    if 'session_type' in data:
-        try:
-            validated['session_type'] = Validator.validate_enum(
-                data.get('session_type'), 'session_type',
-                Validator.SESSION_TYPES,
-                required=not is_update
-            )
-        except ValidationError as e:
-            errors[e.field] = e.message
-    
-    if 'started_at' in data:
-        try:
-            validated['started_at'] = Validator.validate_datetime_iso(
-                data.get('started_at'), 'started_at', required=False
-            )
-        except ValidationError as e:
-            errors[e.field] = e.message
-    
-    if 'completed_at' in data:
-        try:
-            validated['completed_at'] = Validator.validate_datetime_iso(
-                data.get('completed_at'), 'completed_at', required=False
-            )
-        except ValidationError as e:
-            errors[e.field] = e.message
-    
-    if 'duration_minutes' in data:
-        try:
-            validated['duration_minutes'] = Validator.validate_number(
-                data.get('duration_minutes'),
-                'duration_minutes',
-                min_val=1, max_val=600,
-                required=False,
-                allow_float=False
-            )
-        except ValidationError as e:
-            errors[e.field] = e.message
-    
-    if 'calories_burned' in data:
-        try:
-            validated['calories_burned'] = Validator.validate_number(
-                data.get('calories_burned'),
-                'calories_burned',
-                min_val=0, max_val=10000,
-                required=False,
-                allow_float=False
-            )
-        except ValidationError as e:
-            errors[e.field] = e.message
-    
-    if 'exercises_completed' in data:
-        try:
-            validated['exercises_completed'] = Validator.validate_json(
-                data.get('exercises_completed'), 'exercises_completed', required=False
-            )
-        except ValidationError as e:
-            errors[e.field] = e.message
-    
-    if 'notes' in data:
-        validated['notes'] = Validator.sanitize_text(data.get('notes'), max_length=2000)
-    
-    if errors:
-        return None, errors
-    
-    return validated, None
+    return _validate_fields(data, _SESSION_FIELDS, is_update)
 
 
 def validate_habit(data, is_update=False):
     """Validate habit data"""
-    errors = {}
-    validated = {}
-    
-    try:
-        validated['name'] = Validator.validate_string(
-            data.get('name'), 'name', max_length=120, required=not is_update
-        )
-    except ValidationError as e:
-        errors[e.field] = e.message
-    
-    if 'frequency' in data:
-        try:
-            validated['frequency'] = Validator.validate_enum(
-                data.get('frequency'), 'frequency',
-                Validator.HABIT_FREQUENCIES,
-                required=False
-            )
-        except ValidationError as e:
-            errors[e.field] = e.message
-    
-    if 'schedule' in data:
-        try:
-            validated['schedule'] = Validator.validate_json(
-                data.get('schedule'), 'schedule', required=False
-            )
-        except ValidationError as e:
-            errors[e.field] = e.message
-    
-    if 'is_active' in data:
-        try:
-            validated['is_active'] = Validator.validate_boolean(
-                data.get('is_active'), 'is_active', required=False
-            )
-        except ValidationError as e:
-            errors[e.field] = e.message
-    
-    if errors:
-        return None, errors
-    
-    return validated, None
+    return _validate_fields(data, _HABIT_FIELDS, is_update)
@@ -0,0 +1,24 @@
+"""Gunicorn settings for production
+
+    gunicorn -c gunicorn_conf.py run:app
+
+Each worker imports run.py itself (no preload), so it builds and warms its
+own connection pool instead of inheriting sockets from the master. Keep
+WEB_THREADS <= DB_POOL_SIZE + DB_MAX_OVERFLOW so a busy worker never waits
+on the pool.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', 4))
+threads = int(os.getenv('WEB_THREADS', 8))
+worker_class = 'gthread'  # Threads block on the DB and LLM calls, not the CPU
+
+# Long LLM replies and SSE streams hold a thread for the whole response
+timeout = int(os.getenv('WEB_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+preload_app = False
+accesslog = '-'
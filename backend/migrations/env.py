@@ -16,12 +16,10 @@ logger = logging.getLogger('alembic.env')
 
 
 def get_engine():
-    try:
-        # this works with Flask-SQLAlchemy<3 and Alchemical
-        return current_app.extensions['migrate'].db.get_engine()
-    except (TypeError, AttributeError):
-        # this works with Flask-SQLAlchemy>=3
-        return current_app.extensions['migrate'].db.engine
+    # Migrations bypass DATABASE_POOLER_URL: DDL and advisory locks need a
+    # real session, not a transaction-mode pooler
+    from app import get_direct_engine
+    return get_direct_engine()
 
 
 def get_engine_url():
@@ -97,6 +95,10 @@ def run_migrations_online():
     connectable = get_engine()
 
     with connectable.connect() as connection:
+        if connection.dialect.name == 'postgresql':
+            # The app's statement_timeout is for requests; index builds may take longer
+            connection.exec_driver_sql('SET statement_timeout = 0')
+            connection.commit()  # Session-level SET survives; alembic starts its own transaction
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
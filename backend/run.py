@@ -1,43 +1,84 @@
 import os
-from app import create_app, db
+import sys
+from functools import wraps
 
-# Load environment variables
-from dotenv import load_dotenv
-load_dotenv()
+# Load environment variables before config.py reads them at import. The file
+# next to this module is parsed once into a dict; variables already set in the
+# environment (or by the flask CLI's own .env loading) win.
+from dotenv import dotenv_values
+DOTENV = dotenv_values(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+os.environ.update({key: value for key, value in DOTENV.items()
+                   if key not in os.environ and value is not None})
+
+from app import create_app, db, get_direct_engine, warm_pool
+
+# Environment, read once
+FLASK_ENV = os.getenv('FLASK_ENV', 'development')
+PORT = int(os.getenv('PORT', 5000))
+DEBUG = FLASK_ENV == 'development'
 
 # Create Flask app
-app = create_app(os.getenv('FLASK_ENV', 'development'))
+app = create_app(FLASK_ENV)
+
+
+def _cli_command(argv):
+    """Subcommand of a `flask [--app run] <command>` invocation, or None"""
+    args = iter(argv[1:])
+    for arg in args:
+        if arg in ('-A', '--app', '-e', '--env-file'):
+            next(args, None)  # skip the option's value
+        elif not arg.startswith('-'):
+            return arg
+    return None
+
+
+# Fill the connection pool before traffic arrives (gunicorn, `python run.py`
+# and `flask run`); one-shot flask CLI commands open connections on demand.
+# FLASK_RUN_FROM_CLI is set for every flask command, so check which one.
+if FLASK_ENV != 'testing' and (not os.getenv('FLASK_RUN_FROM_CLI') or _cli_command(sys.argv) == 'run'):
+    warm_pool(app)
+
+
+def releases_connections(command):
+    """Close pooled connections when a one-shot CLI command finishes"""
+    @wraps(command)
+    def wrapper(*args, **kwargs):
+        try:
+            return command(*args, **kwargs)
+        finally:
+            db.session.remove()
+            db.engine.dispose()
+    return wrapper
 
 
 @app.cli.command()
+@releases_connections
 def init_db():
     """Initialize the database"""
-    db.create_all()
+    db.metadata.create_all(get_direct_engine())
     print("Database initialized!")
 
 
 @app.cli.command()
+@releases_connections
 def seed_db():
     """Seed database with sample data"""
     from app.models import User, WorkoutRoutine
-    import json
     
     # Create sample user
     user = User(
         email='demo@fitness.com',
         username='demo_user',
         name='Demo User',
-        fitness_level='intermediate',
-        goals=json.dumps(['Build muscle', 'Improve endurance'])
+        fitness_level='intermediate'
     )
+    user.goals_list = ['Build muscle', 'Improve endurance']
     user.set_password('demo123')
     
-    db.session.add(user)
-    db.session.commit()
-    
-    # Create sample routine
+    # Create sample routine (linked through the relationship so both rows
+    # are inserted in one flush, with the user's id filled in)
     routine = WorkoutRoutine(
-        user_id=user.id,
+        user=user,
         name='Full Body Workout',
         description='A comprehensive full-body workout routine',
         exercises=[
@@ -50,7 +91,7 @@ def seed_db():
         is_camera_based=True
     )
     
-    db.session.add(routine)
+    db.session.add_all([user, routine])
     db.session.commit()
     
     print(f"Sample data created!")
@@ -59,8 +100,12 @@ def seed_db():
 
 
 if __name__ == '__main__':
+    # Werkzeug's server is for development only; production runs
+    # `gunicorn -c gunicorn_conf.py run:app`
+    if not DEBUG:
+        raise SystemExit("Use gunicorn outside development: gunicorn -c gunicorn_conf.py run:app")
     app.run(
         host='0.0.0.0',
-        port=int(os.getenv('PORT', 5000)),
-        debug=os.getenv('FLASK_ENV') == 'development'
+        port=PORT,
+        debug=DEBUG
     )